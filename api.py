@@ -1,18 +1,191 @@
-from fastapi import FastAPI, HTTPException, Request
+import time
+
+# 记录模块开始导入的时间，用于统计冷启动耗时
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse, PlainTextResponse
+from pydantic import BaseModel, ValidationError
 from typing import Dict, Any, Optional, List
-import uvicorn
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
 import json
 
-# 导入模板解析器
-from template_parser import parse_template
+# 导入模板解析器；服务只依赖模板和依赖索引，不导入pandas/openpyxl等Excel转换工具的依赖
+from template_parser import get_registry, get_template_sets
+from dependency_index import get_dependency_index
+from shadow_eval import ShadowEvaluator
+import metrics
+
+# orjson为可选依赖，安装后用于请求解析和响应序列化
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 是否启用单条解析的快速路径：请求数据轻量校验、响应直接序列化，可设置TEMPLATE_FAST_PATH=0关闭
+FAST_PATH = os.environ.get("TEMPLATE_FAST_PATH", "1").lower() not in ("", "0", "false", "no")
+
+# 启动耗时预算（秒），从导入模块到预热完成超过预算时打印警告
+STARTUP_BUDGET = float(os.environ.get("TEMPLATE_STARTUP_BUDGET", "3.0"))
+
+# 影子评估配置：指定候选模板文件后，单条解析请求会在后台用候选模板重新解析并记录差异；
+# 评估日志路径、待评估队列上限（已满时丢弃）及参与评估的请求比例
+SHADOW_FILE = os.environ.get("TEMPLATE_SHADOW_FILE")
+SHADOW_LOG = os.environ.get("TEMPLATE_SHADOW_LOG") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "shadow_eval.ndjson")
+SHADOW_QUEUE = int(os.environ.get("TEMPLATE_SHADOW_QUEUE", "1000"))
+SHADOW_SAMPLE = float(os.environ.get("TEMPLATE_SHADOW_SAMPLE", "1.0"))
+
+# 批量解析线程池配置：线程数，以及排队中的批量任务上限，超过上限时直接返回503
+RESOLVE_THREADS = int(os.environ.get("TEMPLATE_RESOLVE_THREADS", "4"))
+MAX_PENDING_BATCHES = int(os.environ.get("TEMPLATE_MAX_PENDING_BATCHES", "32"))
+# NDJSON流式解析每次提交到线程池的行数
+NDJSON_CHUNK_LINES = 200
+
+class ResolveExecutor:
+    def __init__(self, max_workers, max_pending):
+        """
+        批量解析使用的有界线程池，避免CPU密集的批量解析阻塞事件循环
+        
+        Args:
+            max_workers: 线程数
+            max_pending: 同时提交（执行中及排队中）的任务上限
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0  # 只在事件循环线程中读写，无需加锁
+        self._executor = None
+    
+    def start(self):
+        """
+        创建线程池，在应用启动时调用；同一进程中多次启动应用（测试、进程内压测）时每次都重新创建
+        """
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="template-resolve")
+    
+    def check_capacity(self):
+        """
+        检查是否还能接纳新任务，已满时返回503让调用方稍后重试
+        """
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=503,
+                detail={
+                    "code": 503,
+                    "success": False,
+                    "message": "服务繁忙，请稍后重试",
+                    "data": None
+                }
+            )
+    
+    async def run(self, func, *args, admitted=False):
+        """
+        在线程池中执行函数
+        
+        Args:
+            func: 要执行的函数
+            args: 函数参数
+            admitted: 是否为已接纳的流式请求的后续任务，此类任务不受排队上限限制，避免流式响应中途失败
+            
+        Returns:
+            函数返回值
+        """
+        if not admitted:
+            self.check_capacity()
+        self.pending += 1
+        try:
+            # 未经lifespan启动时_executor为None，使用事件循环的默认线程池
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+resolver = ResolveExecutor(RESOLVE_THREADS, MAX_PENDING_BATCHES)
+
+# 影子评估器在lifespan中创建，候选模板的加载不计入模块导入耗时
+shadow = None
+
+def refresh_templates(registry):
+    """
+    检查模板文件并在有变化时热加载，启用监控时记录为load阶段耗时
+    """
+    if not metrics.enabled:
+        registry.refresh()
+        return
+    start = time.perf_counter()
+    registry.refresh()
+    metrics.STAGE_SECONDS.observe(time.perf_counter() - start, "load")
+
+async def watch_templates(registry):
+    """
+    后台定时检查模板文件并热加载，已加载的模板集一并检查并淘汰空闲的模板集，
+    文件I/O和编译在线程中执行，请求路径不再访问文件
+    """
+    while True:
+        await asyncio.sleep(registry.check_interval or 1.0)
+        try:
+            await asyncio.to_thread(refresh_templates, registry)
+            await asyncio.to_thread(get_template_sets().refresh)
+            if shadow is not None:
+                await asyncio.to_thread(shadow.candidate.refresh)
+        except Exception as e:
+            print(f"检查模板文件失败: {e}")
+
+# 启动状态，供就绪检查接口查询
+startup_state = {
+    "ready": False,
+    "import_seconds": None,
+    "warmup_seconds": None,
+    "startup_seconds": None
+}
+
+def warm_up():
+    """
+    预加载并编译模板及依赖索引，避免首个请求承担加载开销
+    """
+    get_registry()
+    get_dependency_index().warm()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global shadow
+    # 导入只发生一次，同一进程中再次进入lifespan时只重新统计预热耗时
+    started = time.perf_counter()
+    await asyncio.to_thread(warm_up)
+    startup_state["import_seconds"] = IMPORT_SECONDS
+    startup_state["warmup_seconds"] = time.perf_counter() - started
+    startup_state["startup_seconds"] = IMPORT_SECONDS + startup_state["warmup_seconds"]
+    if startup_state["startup_seconds"] > STARTUP_BUDGET:
+        print(f"启动耗时 {startup_state['startup_seconds']:.2f}s 超出预算 {STARTUP_BUDGET:.2f}s"
+              f"（导入 {startup_state['import_seconds']:.2f}s，预热 {startup_state['warmup_seconds']:.2f}s）")
+    resolver.start()
+    startup_state["ready"] = True
+    
+    if SHADOW_FILE:
+        shadow = await asyncio.to_thread(ShadowEvaluator, SHADOW_FILE, SHADOW_LOG, SHADOW_QUEUE, SHADOW_SAMPLE)
+        shadow.start()
+    watcher = asyncio.create_task(watch_templates(get_registry()))
+    yield
+    startup_state["ready"] = False
+    watcher.cancel()
+    if shadow is not None:
+        await shadow.stop()
+        shadow = None
+    resolver.shutdown()
 
 # 创建FastAPI应用
 app = FastAPI(
     title="模板解析API",
     description="提供模板解析服务的API接口",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 添加CORS中间件，允许跨域请求
@@ -24,6 +197,33 @@ app.add_middleware(
     allow_headers=["*"],  # 允许所有HTTP头
 )
 
+if metrics.enabled:
+    @app.middleware("http")
+    async def record_request_metrics(request: Request, call_next):
+        start = time.perf_counter()
+        response = await call_next(request)
+        # 按路由模板统计，避免未知路径造成标签数量膨胀
+        route = request.scope.get("route")
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, request.method,
+                                        getattr(route, "path", "unmatched"), response.status_code)
+        return response
+
+def _cache_stat(name):
+    stats = get_registry().cache_stats()
+    return stats[name] if stats is not None else None
+
+metrics.CallbackGauge("template_cache_hits_total", "解析结果缓存命中次数", lambda: _cache_stat("hits"), "counter")
+metrics.CallbackGauge("template_cache_misses_total", "解析结果缓存未命中次数", lambda: _cache_stat("misses"), "counter")
+metrics.CallbackGauge("template_cache_entries", "解析结果缓存条数", lambda: _cache_stat("size"))
+metrics.CallbackGauge("template_sets_loaded", "已加载的模板集数", lambda: get_template_sets().loaded_count())
+def _shadow_stat(name):
+    return getattr(shadow, name) if shadow is not None else None
+
+if SHADOW_FILE:
+    metrics.CallbackGauge("template_shadow_evaluated_total", "影子评估的请求数", lambda: _shadow_stat("evaluated"), "counter")
+    metrics.CallbackGauge("template_shadow_differences_total", "影子评估中结果不一致的请求数", lambda: _shadow_stat("differences"), "counter")
+    metrics.CallbackGauge("template_shadow_dropped_total", "影子评估队列已满丢弃的请求数", lambda: _shadow_stat("dropped"), "counter")
+
 # 定义请求模型
 class UserData(BaseModel):
     org: Optional[str] = ""
@@ -35,6 +235,7 @@ class UserData(BaseModel):
     cur_domain: Optional[str] = ""
     lead_add: Optional[List[Any]] = []
     last_option: Optional[List[Any]] = []
+    namespace: Optional[str] = None  # 模板集名称，为空时使用默认模板
 
 # 定义标准响应模型
 class StandardResponse(BaseModel):
@@ -52,31 +253,224 @@ class TemplateData(BaseModel):
 class TemplateResponse(StandardResponse):
     data: Optional[TemplateData] = None
 
-@app.post("/parse_template", response_model=TemplateResponse, summary="解析模板", description="根据用户数据解析匹配的模板内容")
-async def api_parse_template(user_data: UserData):
-    try:
-        # 将Pydantic模型转换为字典
-        user_dict = user_data.dict()
+# 定义批量模板响应模型，data中每一项对应一条请求数据
+class BatchTemplateResponse(StandardResponse):
+    data: Optional[List[TemplateResponse]] = None
+
+# UserData各字段的类型及默认值，必须与UserData保持一致；REQUIRED表示必填且不能为None
+REQUIRED = object()
+USER_DATA_FIELDS = {
+    "org": (str, str),
+    "time": (str, str),
+    "origin_slot": (dict, REQUIRED),
+    "last_slot": (dict, REQUIRED),
+    "result": (dict, dict),
+    "order": (str, str),
+    "cur_domain": (str, str),
+    "lead_add": (list, list),
+    "last_option": (list, list),
+    "namespace": (str, lambda: None)
+}
+
+def fast_user_dict(payload):
+    """
+    轻量校验请求数据：字段类型与UserData一致时直接引用原始数据中的值，不构建模型也不复制嵌套的槽位字典
+    
+    Args:
+        payload: 已解析的请求JSON
         
-        # 调用模板解析函数
-        result = parse_template(user_dict)
+    Returns:
+        dict: 与UserData.dict()相同字段的用户数据，无法快速校验时返回None，由UserData校验并给出错误信息
+    """
+    if type(payload) is not dict:
+        return None
+    user_dict = {}
+    for field, (field_type, default) in USER_DATA_FIELDS.items():
+        value = payload.get(field)
+        if value is None:
+            if default is REQUIRED:
+                return None
+            # 与UserData一致：缺少字段时使用默认值，显式传入null时保留None
+            value = default() if field not in payload else None
+        elif type(value) is not field_type:
+            return None
+        user_dict[field] = value
+    return user_dict
+
+def _loads(body):
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+def _dumps(value):
+    # 与FastAPI默认的JSONResponse输出一致：不转义非ASCII字符、无多余空格
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _is_json_content_type(content_type):
+    # 与FastAPI解析请求体的规则一致：未指定时按JSON处理，否则需为application/json或application/*+json
+    if not content_type:
+        return True
+    maintype, _, subtype = content_type.split(";")[0].strip().lower().partition("/")
+    return maintype == "application" and (subtype == "json" or subtype.endswith("+json"))
+
+async def read_user_data(request: Request):
+    """
+    读取并校验/parse_template的请求数据，校验失败时返回与FastAPI自动校验相同的422错误
+    
+    Args:
+        request: 请求
         
-        # 构建响应
+    Returns:
+        dict: 用户数据
+    """
+    body = await request.body()
+    if not body:
+        payload = None
+    elif _is_json_content_type(request.headers.get("content-type")):
+        try:
+            payload = _loads(body)
+        except ValueError:
+            # orjson的错误信息与FastAPI不同，出错时用json重新解析以得到相同的错误位置和信息
+            try:
+                payload = json.loads(body)
+            except json.JSONDecodeError as e:
+                raise RequestValidationError([{"type": "json_invalid", "loc": ("body", e.pos), "msg": "JSON decode error",
+                                               "input": {}, "ctx": {"error": e.msg}}])
+    else:
+        payload = body
+    
+    if payload is None:
+        raise RequestValidationError([{"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}])
+    user_dict = fast_user_dict(payload) if FAST_PATH else None
+    if user_dict is None:
+        try:
+            # FastAPI校验请求体时允许从对象属性取值，错误类型随之不同，这里保持一致
+            user_dict = UserData.model_validate(payload, from_attributes=True).dict()
+        except ValidationError as e:
+            raise RequestValidationError([dict(error, loc=("body",) + tuple(error["loc"]))
+                                          for error in e.errors(include_url=False)])
+    return user_dict
+
+# 成功响应中固定不变的前缀，只需拼接模板名称和内容
+_RESPONSE_PREFIX = b'{"code":200,"success":true,"message":' + _dumps("模板解析成功") + b',"data":{"template_name":'
+
+def template_response(result):
+    """
+    直接序列化解析结果，输出与TemplateResponse经FastAPI序列化后的JSON相同，省去模型构建和response_model校验
+    
+    Args:
+        result: 模板解析结果
+        
+    Returns:
+        Response: JSON响应
+    """
+    template_name = result["template"]["name"] if result["template"] else None
+    body = _RESPONSE_PREFIX + _dumps(template_name) + b',"content":' + _dumps(result["content"]) + b'}}'
+    return Response(content=body, media_type="application/json")
+
+def _resolve_item(registry, snapshot, payload):
+    """
+    校验并解析批量请求中的单条数据，错误只记录在该条结果中
+    
+    Args:
+        registry: 模板注册表
+        snapshot: 整批共用的模板快照
+        payload: 单条请求数据
+        
+    Returns:
+        TemplateResponse: 单条解析结果
+    """
+    user_dict = fast_user_dict(payload)
+    if user_dict is None:
+        try:
+            user_data = UserData(**payload) if isinstance(payload, dict) else UserData.parse_obj(payload)
+        except ValidationError as e:
+            return TemplateResponse(code=422, success=False, message=f"请求数据格式错误: {e.errors()}")
+        user_dict = user_data.dict()
+    # 整批使用同一模板集，单条数据中的namespace不生效
+    user_dict.pop("namespace", None)
+    
+    try:
+        result = registry.resolve(user_dict, snapshot)
         template_data = TemplateData(
             template_name=result["template"]["name"] if result["template"] else None,
             content=result["content"]
         )
+        return TemplateResponse(code=200, success=True, message="模板解析成功", data=template_data)
+    except Exception as e:
+        if metrics.enabled:
+            metrics.ERRORS.inc("/parse_template/batch")
+        return TemplateResponse(code=500, success=False, message=f"模板解析失败: {str(e)}")
+
+async def get_namespace_registry(namespace):
+    """
+    获取请求使用的模板注册表，模板集未加载时在线程中加载，之后的请求只做内存查找
+    
+    Args:
+        namespace: 模板集名称，为空时使用默认模板
         
-        response = TemplateResponse(
-            code=200,
-            success=True,
-            message="模板解析成功",
-            data=template_data
+    Returns:
+        TemplateRegistry: 模板注册表
+    """
+    if not namespace:
+        return get_registry()
+    template_sets = get_template_sets()
+    registry = template_sets.loaded(namespace)
+    if registry is not None:
+        return registry
+    try:
+        return await asyncio.to_thread(template_sets.get, namespace)
+    except KeyError:
+        raise HTTPException(
+            status_code=404,
+            detail={"code": 404, "success": False, "message": f"模板集不存在: {namespace}", "data": None}
         )
+
+async def parse_user_data(user_dict, namespace):
+    """
+    使用模板集解析单条用户数据
+    
+    Args:
+        user_dict: 已校验的用户数据
+        namespace: 模板集名称，为空时使用默认模板
+        
+    Returns:
+        Response: 模板解析结果
+    """
+    registry = await get_namespace_registry(namespace)
+    try:
+        # 调用模板解析函数；快照由后台任务热加载，这里只做内存中的匹配和渲染，不会阻塞事件循环
+        snapshot = registry.current_snapshot()
+        result = registry.resolve(user_dict, snapshot)
+        if shadow is not None and not namespace:
+            # 只入队，候选模板的解析在后台进行，不增加响应耗时
+            shadow.submit(user_dict, snapshot)
+        
+        # 构建响应
+        if metrics.enabled:
+            start = time.perf_counter()
+        if FAST_PATH:
+            response = template_response(result)
+        else:
+            template_data = TemplateData(
+                template_name=result["template"]["name"] if result["template"] else None,
+                content=result["content"]
+            )
+            
+            response = TemplateResponse(
+                code=200,
+                success=True,
+                message="模板解析成功",
+                data=template_data
+            )
+        if metrics.enabled:
+            metrics.STAGE_SECONDS.observe(time.perf_counter() - start, "serialize")
         
         return response
     except Exception as e:
         # 异常处理
+        if metrics.enabled:
+            metrics.ERRORS.inc("/parse_template")
         raise HTTPException(
             status_code=500,
             detail={
@@ -87,6 +481,182 @@ async def api_parse_template(user_data: UserData):
             }
         )
 
+# 请求体由read_user_data手动解析，需单独声明请求体结构以保留接口文档
+PARSE_TEMPLATE_BODY = {"requestBody": {"required": True,
+                                       "content": {"application/json": {"schema": UserData.model_json_schema()}}}}
+
+@app.post("/parse_template", response_model=TemplateResponse, summary="解析模板",
+          description="根据用户数据解析匹配的模板内容，请求数据中带namespace时使用对应的模板集",
+          openapi_extra=PARSE_TEMPLATE_BODY)
+async def api_parse_template(request: Request):
+    user_dict = await read_user_data(request)
+    return await parse_user_data(user_dict, user_dict.pop("namespace"))
+
+@app.post("/namespaces/{namespace}/parse_template", response_model=TemplateResponse, summary="按模板集解析模板",
+          description="使用路径中指定的模板集解析用户数据，忽略请求数据中的namespace",
+          openapi_extra=PARSE_TEMPLATE_BODY)
+async def api_parse_namespace_template(namespace: str, request: Request):
+    user_dict = await read_user_data(request)
+    user_dict.pop("namespace")
+    return await parse_user_data(user_dict, namespace)
+
+@app.post("/parse_template/batch", response_model=BatchTemplateResponse, summary="批量解析模板", description="按顺序解析多条用户数据，整批使用同一模板快照（namespace参数指定的模板集），单条失败不影响其他数据")
+async def api_parse_template_batch(payloads: List[Any], namespace: Optional[str] = None):
+    # 整批使用同一模板快照，避免中途热加载导致结果不一致
+    registry = await get_namespace_registry(namespace)
+    snapshot = registry.current_snapshot()
+    items = await resolver.run(lambda: [_resolve_item(registry, snapshot, payload) for payload in payloads])
+    failed = sum(1 for item in items if not item.success)
+    
+    return BatchTemplateResponse(
+        code=200,
+        success=True,
+        message=f"批量解析完成，共{len(items)}条，失败{failed}条",
+        data=items
+    )
+
+@app.post("/parse_template/batch/ndjson", summary="流式批量解析模板", description="请求体每行一条JSON格式的用户数据，按行流式返回解析结果（NDJSON），namespace参数指定模板集")
+async def api_parse_template_ndjson(request: Request, namespace: Optional[str] = None):
+    registry = await get_namespace_registry(namespace)
+    snapshot = registry.current_snapshot()
+    # 开始流式返回前检查是否过载，已开始的流不再中途拒绝
+    resolver.check_capacity()
+    
+    def resolve_line(line):
+        try:
+            payload = json.loads(line)
+        except ValueError as e:
+            item = TemplateResponse(code=400, success=False, message=f"JSON格式错误: {str(e)}")
+        else:
+            item = _resolve_item(registry, snapshot, payload)
+        return json.dumps(item.dict(), ensure_ascii=False) + "\n"
+    
+    # StreamingResponse发送期间会占用receive监听断开，请求体需在返回前读取完毕
+    body = await request.body()
+    
+    lines = [line for line in body.splitlines() if line.strip()]
+    
+    async def stream_results():
+        # 按块提交到线程池解析，每块解析完成后立即返回
+        for start in range(0, len(lines), NDJSON_CHUNK_LINES):
+            chunk = lines[start:start + NDJSON_CHUNK_LINES]
+            yield await resolver.run(lambda: "".join(resolve_line(line) for line in chunk), admitted=True)
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@app.get("/cache_stats", response_model=StandardResponse, summary="缓存统计", description="查看模板解析结果缓存的命中情况")
+async def cache_stats():
+    stats = get_registry().cache_stats()
+    return StandardResponse(
+        code=200,
+        success=True,
+        message="缓存已启用" if stats is not None else "缓存未启用",
+        data=stats
+    )
+
+@app.get("/shadow", response_model=StandardResponse, summary="影子评估统计",
+         description="查看候选模板影子评估的队列、丢弃及结果差异计数，需设置环境变量TEMPLATE_SHADOW_FILE指定候选模板")
+async def shadow_stats():
+    return StandardResponse(
+        code=200,
+        success=True,
+        message="影子评估已启用" if shadow is not None else "影子评估未启用",
+        data=shadow.stats() if shadow is not None else None
+    )
+
+@app.get("/namespaces", response_model=StandardResponse, summary="模板集列表",
+         description="查看模板集目录下可用的模板集、已加载模板集的模板数及空闲时间，以及加载和淘汰次数")
+async def api_namespaces():
+    stats = await asyncio.to_thread(get_template_sets().stats)
+    return StandardResponse(code=200, success=True, message="查询成功", data=stats)
+
+@app.get("/metrics", response_class=PlainTextResponse, summary="监控指标", description="以Prometheus文本格式输出模板解析的耗时、匹配及错误统计，需设置环境变量TEMPLATE_METRICS=1开启采集")
+async def api_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def _dependency_error(status_code, message):
+    return HTTPException(
+        status_code=status_code,
+        detail={"code": status_code, "success": False, "message": message, "data": None}
+    )
+
+@app.get("/dependency", response_model=StandardResponse, summary="查询槽位依赖",
+         description="查询dependency.json中领域意图下的有效槽位及取值：不带参数返回全部领域意图；带domain返回意图；"
+                     "带domain和intent返回槽位及取值，再带slot只返回该槽位取值，再带value同时判断取值是否有效；"
+                     "只带value反向查找取值所属的领域意图；其他参数组合返回400")
+async def api_dependency(domain: Optional[str] = None, intent: Optional[str] = None,
+                         slot: Optional[str] = None, value: Optional[str] = None):
+    # 不会被使用的参数组合直接报错，避免调用方误以为参数已生效
+    if intent is not None and domain is None:
+        raise _dependency_error(400, "查询intent时必须同时指定domain")
+    if slot is not None and intent is None:
+        raise _dependency_error(400, "查询slot时必须同时指定domain和intent")
+    if value is not None and domain is not None and slot is None:
+        raise _dependency_error(400, "带domain查询value时必须同时指定intent和slot")
+    
+    index = get_dependency_index()
+    if domain is None:
+        if value is not None:
+            data = {"value": value, "candidates": index.lookup_value(value)}
+        else:
+            data = {"domains": index.domains(), "stats": index.stats()}
+    elif intent is None:
+        intents = index.intents(domain)
+        data = {"domain": domain, "intents": intents} if intents is not None else None
+    elif slot is None:
+        slots = index.slots(domain, intent)
+        data = {"domain": domain, "intent": intent, "slots": slots} if slots is not None else None
+    else:
+        values = index.values(domain, intent, slot)
+        data = {"domain": domain, "intent": intent, "slot": slot, "values": values} if values is not None else None
+        if data is not None and value is not None:
+            data["valid"] = index.is_valid(domain, intent, slot, value)
+    
+    if data is None:
+        raise _dependency_error(404, "未找到对应的依赖数据")
+    return StandardResponse(code=200, success=True, message="查询成功", data=data)
+
+@app.get("/dependency/missing_slots", response_model=StandardResponse, summary="查询缺失槽位",
+         description="根据已填的槽位（filled，可重复，格式为\"槽位:值\"）找出领域意图下与之相容的槽位组合中尚未填写的槽位及可选取值，"
+                     "用于追问缺失槽位")
+async def api_missing_slots(domain: str, intent: str, filled: List[str] = Query(default=[])):
+    user_slots = {}
+    for item in filled:
+        slot_name, sep, slot_value = item.partition(":")
+        if not sep or not slot_name:
+            raise _dependency_error(400, f"filled格式错误，应为\"槽位:值\": {item}")
+        user_slots[slot_name] = slot_value
+    
+    missing = get_dependency_index().missing_slots(domain, intent, user_slots)
+    if missing is None:
+        raise _dependency_error(404, "未找到对应的依赖数据")
+    return StandardResponse(code=200, success=True, message="查询成功",
+                            data={"domain": domain, "intent": intent, "filled": user_slots, "missing": missing})
+
+@app.get("/ready", response_model=StandardResponse, summary="就绪检查",
+         description="模板和依赖索引预热完成且模板不为空时返回200，否则返回503；同时返回启动各阶段耗时")
+async def ready():
+    snapshot = get_registry().current_snapshot()
+    template_count = len(snapshot.parser.templates)
+    is_ready = startup_state["ready"] and template_count > 0
+    data = {
+        "ready": is_ready,
+        "templates": template_count,
+        "template_digest": snapshot.digest,
+        "dependency_rows": len(get_dependency_index().rows),
+        "import_seconds": startup_state["import_seconds"],
+        "warmup_seconds": startup_state["warmup_seconds"],
+        "startup_seconds": startup_state["startup_seconds"],
+        "startup_budget_seconds": STARTUP_BUDGET,
+        "within_budget": startup_state["startup_seconds"] is not None and startup_state["startup_seconds"] <= STARTUP_BUDGET
+    }
+    if not is_ready:
+        raise HTTPException(
+            status_code=503,
+            detail={"code": 503, "success": False, "message": "服务尚未就绪", "data": data}
+        )
+    return StandardResponse(code=200, success=True, message="服务已就绪", data=data)
+
 @app.get("/", summary="API状态检查", description="检查API服务是否正常运行")
 async def root():
     return {
@@ -96,6 +666,24 @@ async def root():
         "data": {"status": "running"}
     }
 
+# 模块导入耗时，在模块末尾记录一次
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
+
 # 启动服务器
 if __name__ == "__main__":
-    uvicorn.run("api:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    # 只在直接启动时导入，避免作为模块被worker导入时的额外开销
+    import argparse
+    import uvicorn
+    
+    parser = argparse.ArgumentParser(description="模板解析API服务")
+    parser.add_argument("--host", default="0.0.0.0", help="监听地址")
+    parser.add_argument("--port", type=int, default=8000, help="监听端口")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "1")),
+                        help="worker进程数，生产环境按CPU核数设置")
+    parser.add_argument("--reload", action="store_true", help="开发模式，代码变化时自动重启，只能单进程运行")
+    args = parser.parse_args()
+    
+    if args.reload:
+        uvicorn.run("api:app", host=args.host, port=args.port, reload=True)
+    else:
+        uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers)
\ No newline at end of file
@@ -0,0 +1,439 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import redirect_stdout
+
+from template_parser import TemplateParser
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+default_dependency_path = os.path.join(current_dir, "dependency.json")
+
+
+def load_distribution(dependency_file_path=default_dependency_path):
+    """
+    从dependency.json统计真实的(domain, intent)分布及其槽位取值
+
+    Args:
+        dependency_file_path: dependency.json路径
+
+    Returns:
+        list: [((domain, intent), 出现次数, {槽位名: [取值]})]，按出现次数降序
+    """
+    with open(dependency_file_path, 'r', encoding='utf-8') as f:
+        rows = json.load(f)
+
+    counts = Counter()
+    slot_values = defaultdict(lambda: defaultdict(set))
+    for row in rows:
+        pair = (str(row["domain"]), str(row["intent"]))
+        counts[pair] += 1
+        slots = row["slots"] if isinstance(row["slots"], dict) else {}
+        for slot_name, values in slots.items():
+            values = values if isinstance(values, list) else [values]
+            slot_values[pair][slot_name].update(str(value) for value in values)
+
+    return [(pair, count, {name: sorted(values) for name, values in slot_values[pair].items()})
+            for pair, count in counts.most_common()]
+
+
+def _weighted_pairs(distribution, rng, k):
+    return rng.choices(distribution, weights=[count for _, count, _ in distribution], k=k)
+
+
+def generate_templates(distribution, count, wildcard_ratio=0.1, exact_slot_ratio=0.1, seed=0):
+    """
+    按真实分布生成合成模板目录
+
+    Args:
+        distribution: load_distribution的返回值
+        count: 模板数量
+        wildcard_ratio: domain、intent使用通配符的比例
+        exact_slot_ratio: 槽位要求精确取值（而非通配符）的比例
+        seed: 随机种子
+
+    Returns:
+        list: 模板列表，结构与template.json一致
+    """
+    rng = random.Random(seed)
+    templates = []
+    for index, (pair, _, slot_values) in enumerate(_weighted_pairs(distribution, rng, count)):
+        domain, intent = pair
+        slot_names = list(slot_values) or ["query"]
+        required = rng.sample(slot_names, rng.randint(1, min(4, len(slot_names))))
+
+        def condition():
+            return {
+                "domain": ["*" if rng.random() < wildcard_ratio else domain],
+                "intent": ["*" if rng.random() < wildcard_ratio else intent],
+                "slots": [{name: rng.choice(slot_values[name])
+                           if slot_values.get(name) and rng.random() < exact_slot_ratio else "*"}
+                          for name in required]
+            }
+
+        placeholders = "".join(f"{{{{last_slot.slots.{name}}}}}的" for name in required)
+        templates.append({
+            "name": f"T_{domain}_{intent}_{index}",
+            "priority": str(rng.randint(1, 5)),
+            "examples": [],
+            "conditions": {"origin_slot": condition(), "last_slot": condition()},
+            "content": f"小智在{{{{origin_slot.domain}}}}领域下，未能找到{{{{org}}}}的{placeholders}数据。"
+        })
+    return templates
+
+
+def generate_workload(distribution, count, miss_ratio=0.1, seed=0):
+    """
+    按真实分布生成UserData请求数据
+
+    Args:
+        distribution: load_distribution的返回值
+        count: 请求数量
+        miss_ratio: 使用不存在的领域、必然无法匹配的请求比例
+        seed: 随机种子
+
+    Returns:
+        list: 用户数据列表，结构与api.UserData一致
+    """
+    rng = random.Random(seed + 1)
+    workload = []
+    for pair, _, slot_values in _weighted_pairs(distribution, rng, count):
+        domain, intent = pair
+        if rng.random() < miss_ratio:
+            domain = f"未知领域{rng.randint(0, 999)}"
+        slots = {name: rng.choice(values) if values else "" for name, values in slot_values.items()}
+        side = {"domain": domain, "intent": intent, "slots": slots}
+        workload.append({
+            "org": "石家庄", "time": "2024年4月", "origin_slot": side, "last_slot": dict(side),
+            "result": {}, "order": "", "cur_domain": domain, "lead_add": [], "last_option": []
+        })
+    return workload
+
+
+def summarize(name, latencies_ns, total_seconds=None, **extra):
+    """
+    汇总一组延迟数据
+
+    Args:
+        name: 测试项名称
+        latencies_ns: 每次调用的耗时（纳秒）
+        total_seconds: 总耗时（秒），默认为延迟之和
+
+    Returns:
+        dict: 延迟百分位、吞吐量等统计
+    """
+    ordered = sorted(latencies_ns)
+    if total_seconds is None:
+        total_seconds = sum(ordered) / 1e9
+
+    def percentile(p):
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] / 1e3
+
+    result = {
+        "name": name,
+        "count": len(ordered),
+        "p50_us": percentile(50),
+        "p90_us": percentile(90),
+        "p99_us": percentile(99),
+        "max_us": ordered[-1] / 1e3 if ordered else 0.0,
+        "throughput_per_s": len(ordered) / total_seconds if total_seconds else 0.0
+    }
+    result.update(extra)
+    return result
+
+
+def _measure(func, items, repeat=1):
+    latencies = []
+    clock = time.perf_counter_ns
+    for _ in range(repeat):
+        for item in items:
+            start = clock()
+            func(item)
+            latencies.append(clock() - start)
+    return latencies
+
+
+def _run_stage(func, trace_memory=False):
+    """
+    执行一次整体耗时的测试项
+
+    Args:
+        func: 被测函数
+        trace_memory: 是否另外执行一次并用tracemalloc统计Python内存峰值，与计时分开执行避免影响耗时
+
+    Returns:
+        tuple: (函数返回值, 耗时秒数, 内存峰值KB或None)
+    """
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+
+    peak_kb = None
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            func()
+            peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+    return result, seconds, peak_kb
+
+
+def _stage_result(name, count, seconds, peak_kb):
+    result = {"name": name, "count": count, "seconds": seconds,
+              "throughput_per_s": count / seconds if seconds else 0.0}
+    if peak_kb is not None:
+        result["peak_memory_kb"] = peak_kb
+    return result
+
+
+def bench_parser(templates, workload, repeat, trace_memory=False):
+    results = []
+
+    parser, seconds, peak_kb = _run_stage(lambda: TemplateParser(templates=templates), trace_memory)
+    results.append(_stage_result("compile", len(templates), seconds, peak_kb))
+
+    latencies = _measure(parser.find_best_template, workload, repeat)
+    matched = sum(1 for user_data in workload if parser.find_best_template(user_data)["template"])
+    results.append(summarize("find_best_template", latencies, match_rate=matched / max(len(workload), 1)))
+
+    # 使用预编译的渲染计划，与线上解析的渲染路径一致
+    orders = list(range(min(len(templates), len(workload)))) or [0]
+    pairs = list(zip(orders * (len(workload) // len(orders) + 1), workload))
+    latencies = _measure(lambda pair: parser.render(pair[0], pair[1]), pairs, repeat)
+    results.append(summarize("render", latencies))
+    return results
+
+
+def bench_endpoint(template_file_path, workload, repeat):
+    try:
+        from fastapi.testclient import TestClient
+    except ImportError as e:
+        print(f"跳过接口测试: {e}")
+        return []
+
+    # 接口使用默认注册表，通过环境变量指向合成模板目录
+    os.environ["TEMPLATE_FILE_PATH"] = template_file_path
+    import api
+
+    with TestClient(api.app) as client:
+        # 多个规模复用同一文件路径，立即重新加载而不等待文件变化检查间隔
+        api.get_registry().reload()
+        latencies = _measure(lambda user_data: client.post("/parse_template", json=user_data), workload, repeat)
+    return [summarize("POST /parse_template", latencies)]
+
+
+# 在子进程中测量冷启动：导入api模块并预热模板和依赖索引
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import api
+imported = time.perf_counter()
+api.warm_up()
+finished = time.perf_counter()
+print(json.dumps({"import_seconds": imported - started, "warmup_seconds": finished - imported,
+                  "heavy_modules": [name for name in ("pandas", "openpyxl") if name in sys.modules]}))
+"""
+
+
+def bench_startup(template_file_path, runs, budget):
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, TEMPLATE_FILE_PATH=template_file_path)
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=current_dir, env=env,
+                                   capture_output=True, text=True)
+        seconds = time.perf_counter() - start
+        if completed.returncode != 0:
+            print(f"跳过启动测试: {completed.stderr.strip().splitlines()[-1:]}")
+            return []
+        samples.append((seconds, json.loads(completed.stdout.strip().splitlines()[-1])))
+
+    # 取最快的一次，减少磁盘缓存等外部因素的干扰
+    seconds, detail = min(samples, key=lambda sample: sample[0])
+    if detail["heavy_modules"]:
+        print(f"  警告: 服务启动时导入了Excel转换依赖 {detail['heavy_modules']}")
+    if seconds > budget:
+        print(f"  警告: 启动耗时 {seconds:.3f}s 超出预算 {budget:.3f}s")
+    result = _stage_result("startup", 1, seconds, None)
+    result.update(import_seconds=detail["import_seconds"], warmup_seconds=detail["warmup_seconds"],
+                  within_budget=seconds <= budget)
+    return [result]
+
+
+def bench_json_to_excel(template_file_path, count, workdir, trace_memory=False):
+    try:
+        from json_to_excel import json_to_excel, bulk_json_to_excel
+    except ImportError as e:
+        print(f"跳过json_to_excel测试: {e}")
+        return []
+
+    excel_output_path = os.path.join(workdir, "bench_templates.xlsx")
+    results = []
+    for name, func in (("json_to_excel", json_to_excel), ("json_to_excel_bulk", bulk_json_to_excel)):
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            _, seconds, peak_kb = _run_stage(lambda: func(template_file_path, excel_output_path), trace_memory)
+        results.append(_stage_result(name, count, seconds, peak_kb))
+    return results
+
+
+def bench_excel_to_json(excel_file_path, workdir, trace_memory=False):
+    try:
+        from excel_to_json import stream_excel_to_json
+    except ImportError as e:
+        print(f"跳过excel_to_json测试: {e}")
+        return []
+
+    output_path = os.path.join(workdir, "bench_dependency.json")
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        sheet_stats, seconds, peak_kb = _run_stage(lambda: stream_excel_to_json(excel_file_path, output_path),
+                                                   trace_memory)
+    return [_stage_result("excel_to_json", sum(stats["records"] for stats in sheet_stats), seconds, peak_kb)]
+
+
+def run(args):
+    distribution = load_distribution(args.dependency)
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key != "func"},
+        "python": sys.version.split()[0],
+        "started_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "scales": []
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in args.templates:
+            templates = generate_templates(distribution, scale, args.wildcard_ratio, args.exact_slot_ratio, args.seed)
+            workload = generate_workload(distribution, args.requests, args.miss_ratio, args.seed)
+            template_file_path = os.path.join(workdir, "bench_templates.json")
+            with open(template_file_path, 'w', encoding='utf-8') as f:
+                json.dump(templates, f, ensure_ascii=False)
+
+            print(f"模板数量 {scale}：")
+            results = bench_parser(templates, workload, args.repeat, args.trace_memory)
+            if "endpoint" in args.suites:
+                results += bench_endpoint(template_file_path, workload[:args.endpoint_requests], 1)
+            if "startup" in args.suites:
+                results += bench_startup(template_file_path, args.startup_runs, args.startup_budget)
+            if "conversion" in args.suites:
+                results += bench_json_to_excel(template_file_path, scale, workdir, args.trace_memory)
+            for result in results:
+                print("  " + format_result(result))
+            report["scales"].append({"templates": scale, "results": results})
+
+        # Excel转换与模板规模无关，只执行一次
+        if "conversion" in args.suites and args.excel:
+            print("Excel转换：")
+            results = bench_excel_to_json(args.excel, workdir, args.trace_memory)
+            for result in results:
+                print("  " + format_result(result))
+            report["scales"].append({"templates": None, "results": results})
+
+    try:
+        import resource
+        # Linux下单位为KB
+        report["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(f"进程内存峰值(RSS) {report['max_rss_kb']}KB")
+    except ImportError:
+        pass
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+        print(f"测试结果已保存至 {args.output}")
+    return 0
+
+
+def format_result(result):
+    if "p50_us" in result:
+        return (f"{result['name']}: p50 {result['p50_us']:.1f}us  p90 {result['p90_us']:.1f}us  "
+                f"p99 {result['p99_us']:.1f}us  吞吐 {result['throughput_per_s']:.0f}/s")
+    text = f"{result['name']}: {result['seconds']:.3f}s  吞吐 {result['throughput_per_s']:.0f}/s"
+    if "peak_memory_kb" in result:
+        text += f"  内存峰值 {result['peak_memory_kb']:.0f}KB"
+    if "import_seconds" in result:
+        text += f"  导入 {result['import_seconds']:.3f}s  预热 {result['warmup_seconds']:.3f}s"
+    return text
+
+
+def compare(args):
+    """
+    对比两次测试结果，任一指标变差超过阈值时返回非0，便于作为发布前的性能门禁
+    """
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.candidate, 'r', encoding='utf-8') as f:
+        candidate = json.load(f)
+
+    # 指标名 -> 数值越大是否越好
+    metrics = {"p50_us": False, "p99_us": False, "throughput_per_s": True,
+               "seconds": False, "peak_memory_kb": False}
+    base_results = {(scale["templates"], result["name"]): result
+                    for scale in baseline["scales"] for result in scale["results"]}
+
+    regressions = 0
+    for scale in candidate["scales"]:
+        for result in scale["results"]:
+            base = base_results.get((scale["templates"], result["name"]))
+            if base is None:
+                continue
+            for metric, higher_is_better in metrics.items():
+                if metric not in result or not base.get(metric):
+                    continue
+                change = (result[metric] - base[metric]) / base[metric]
+                worse = -change if higher_is_better else change
+                flag = ""
+                if worse > args.threshold:
+                    flag = "  <-- 性能下降"
+                    regressions += 1
+                print(f"[{scale['templates'] or 'excel'}] {result['name']} {metric}: "
+                      f"{base[metric]:.4g} -> {result[metric]:.4g} ({change:+.1%}){flag}")
+
+    print(f"共 {regressions} 项指标下降超过 {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模板解析及转换工具的性能测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="生成合成数据并执行性能测试")
+    run_parser.add_argument("--templates", type=int, nargs="+", default=[10, 1000, 10000],
+                            help="模板数量，可指定多个规模")
+    run_parser.add_argument("--requests", type=int, default=2000, help="每个规模的请求数量")
+    run_parser.add_argument("--repeat", type=int, default=3, help="请求重复次数")
+    run_parser.add_argument("--wildcard-ratio", type=float, default=0.1, help="通配符比例")
+    run_parser.add_argument("--exact-slot-ratio", type=float, default=0.1, help="槽位要求精确取值的比例")
+    run_parser.add_argument("--miss-ratio", type=float, default=0.1, help="无法匹配的请求比例")
+    run_parser.add_argument("--seed", type=int, default=0, help="随机种子，相同种子生成相同数据")
+    run_parser.add_argument("--suites", nargs="*", default=[], choices=["endpoint", "conversion", "startup"],
+                            help="额外执行的测试：接口、Excel转换、冷启动")
+    run_parser.add_argument("--endpoint-requests", type=int, default=500, help="接口测试的请求数量")
+    run_parser.add_argument("--startup-runs", type=int, default=3, help="启动测试的重复次数，取最快一次")
+    run_parser.add_argument("--startup-budget", type=float, default=3.0, help="启动耗时预算（秒），包含解释器启动")
+    run_parser.add_argument("--excel", help="excel_to_json测试使用的Excel文件")
+    run_parser.add_argument("--trace-memory", action="store_true",
+                            help="额外执行一次编译和转换，用tracemalloc统计内存峰值")
+    run_parser.add_argument("--dependency", default=default_dependency_path, help="dependency.json路径")
+    run_parser.add_argument("--output", help="测试结果JSON文件路径")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser("compare", help="对比两次测试结果")
+    compare_parser.add_argument("baseline", help="基准结果文件")
+    compare_parser.add_argument("candidate", help="待比较结果文件")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="允许的性能下降比例")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+if __name__ == "__main__":
+    main()
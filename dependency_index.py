@@ -0,0 +1,310 @@
+import json
+import os
+import threading
+from collections.abc import Hashable
+
+from template_snapshot import SnapshotReader, open_fresh_snapshot
+
+
+class DependencyIndex:
+    def __init__(self, dependency_file_path=None, rows=None):
+        """
+        dependency.json的内存索引，加载时只建立 领域 -> 意图 -> 行号 的轻量索引，
+        各领域意图的槽位表在首次查询或预热（warm）时才解码并建立
+
+        Args:
+            dependency_file_path: dependency.json文件路径
+            rows: 已加载的依赖数据，传入时不再读取文件
+        """
+        self.dependency_file_path = dependency_file_path
+        self.rows = rows if rows is not None else self._load_rows()
+        self._build_index()
+
+    def _load_rows(self):
+        """
+        加载依赖数据，存在未过期的二进制快照时直接使用快照，快照保持打开，行数据在查询时才解码
+
+        Returns:
+            list | SnapshotReader: 依赖数据
+        """
+        try:
+            reader = open_fresh_snapshot(self.dependency_file_path)
+            if reader is not None:
+                return reader
+            with open(self.dependency_file_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"加载依赖文件失败: {e}")
+            return []
+
+    def _field(self, row_index, key):
+        if isinstance(self.rows, SnapshotReader):
+            # 只解码需要的字段，其余数据留在共享的页缓存中
+            return self.rows.field(row_index, key)
+        row = self.rows[row_index]
+        return row.get(key) if isinstance(row, dict) else None
+
+    def _build_index(self):
+        """
+        建立 领域 -> 意图 -> 行号 的索引，只读取每行的领域和意图
+        """
+        # 集合用dict保存，保持依赖文件中的首次出现顺序，便于输出稳定
+        self._rows_by_key = {}
+        for row_index in range(len(self.rows)):
+            domain = self._field(row_index, "domain")
+            intent = self._field(row_index, "intent")
+            if not isinstance(domain, str) or not isinstance(intent, str):
+                print(f"跳过无效的依赖数据: 第{row_index + 1}行")
+                continue
+            self._rows_by_key.setdefault(domain, {}).setdefault(intent, []).append(row_index)
+        # (领域, 意图) -> (槽位名称 -> 取值集合, 槽位组合列表)，按需建立
+        self._tables = {}
+        # 取值 -> (领域, 意图) -> 槽位名称，首次反向查找时建立
+        self._value_index = None
+
+    def _table(self, domain, intent):
+        """
+        获取领域意图下的槽位表，首次查询时解码该领域意图的各行并建立；
+        并发查询时可能重复建立，结果相同，后写入的覆盖先写入的即可
+
+        Returns:
+            tuple: (槽位名称 -> 取值集合, 槽位组合列表)，领域意图不存在时返回None
+        """
+        table = self._tables.get((domain, intent))
+        if table is not None:
+            return table
+        row_indexes = self._rows_by_key.get(domain, {}).get(intent)
+        if row_indexes is None:
+            return None
+
+        slot_values = {}
+        # 同一领域意图下的每行代表一种有效的槽位组合
+        combinations = []
+        for row_index in row_indexes:
+            slots = self._row_slots(row_index)
+            if slots is None:
+                continue
+            for slot_name, values in slots.items():
+                slot_values.setdefault(slot_name, {}).update(dict.fromkeys(values))
+            combinations.append({slot_name: frozenset(values) for slot_name, values in slots.items()})
+        table = (slot_values, combinations)
+        self._tables[(domain, intent)] = table
+        return table
+
+    def _row_slots(self, row_index):
+        """
+        解码一行的槽位，取值统一为可哈希值的列表
+
+        Returns:
+            dict: 槽位名称 -> 取值列表，槽位数据无效时返回None
+        """
+        slots = self._field(row_index, "slots")
+        if not isinstance(slots, dict):
+            print(f"跳过无效的依赖数据: 第{row_index + 1}行")
+            return None
+        row_slots = {}
+        for slot_name, values in slots.items():
+            if not isinstance(values, list):
+                values = [values]
+            row_slots[slot_name] = [value for value in values if isinstance(value, Hashable)]
+        return row_slots
+
+    def _values_index(self):
+        """
+        获取反向索引 取值 -> (领域, 意图) -> 槽位名称，需要解码全部行，首次反向查找时建立
+        """
+        if self._value_index is None:
+            keys = sorted((row_index, domain, intent) for domain, intents in self._rows_by_key.items()
+                          for intent, row_indexes in intents.items() for row_index in row_indexes)
+            value_index = {}
+            # 按行顺序建立，候选顺序与依赖文件中的首次出现顺序一致
+            for row_index, domain, intent in keys:
+                slots = self._row_slots(row_index)
+                for slot_name, values in (slots or {}).items():
+                    for value in values:
+                        value_index.setdefault(value, {}).setdefault((domain, intent), {})[slot_name] = None
+            self._value_index = value_index
+        return self._value_index
+
+    def warm(self):
+        """
+        预先建立全部领域意图的槽位表及反向索引，使后续查询不再承担解码开销
+        """
+        for domain, intents in self._rows_by_key.items():
+            for intent in intents:
+                self._table(domain, intent)
+        self._values_index()
+
+    def domains(self):
+        """
+        获取全部领域及其意图
+
+        Returns:
+            dict: 领域 -> 意图列表
+        """
+        return {domain: list(intents) for domain, intents in self._rows_by_key.items()}
+
+    def intents(self, domain):
+        """
+        获取领域下的意图
+
+        Args:
+            domain: 领域
+
+        Returns:
+            list: 意图列表，领域不存在时返回None
+        """
+        intents = self._rows_by_key.get(domain)
+        return list(intents) if intents is not None else None
+
+    def slots(self, domain, intent):
+        """
+        获取领域意图下的有效槽位及取值
+
+        Args:
+            domain: 领域
+            intent: 意图
+
+        Returns:
+            dict: 槽位名称 -> 取值列表，领域意图不存在时返回None
+        """
+        table = self._table(domain, intent)
+        if table is None:
+            return None
+        return {slot_name: list(values) for slot_name, values in table[0].items()}
+
+    def values(self, domain, intent, slot_name):
+        """
+        获取某个槽位的有效取值
+
+        Args:
+            domain: 领域
+            intent: 意图
+            slot_name: 槽位名称
+
+        Returns:
+            list: 取值列表，槽位不存在时返回None
+        """
+        table = self._table(domain, intent)
+        values = table[0].get(slot_name) if table is not None else None
+        return list(values) if values is not None else None
+
+    def is_valid(self, domain, intent, slot_name, value):
+        """
+        判断槽位取值在领域意图下是否有效
+
+        Args:
+            domain: 领域
+            intent: 意图
+            slot_name: 槽位名称
+            value: 槽位取值
+
+        Returns:
+            bool: 是否有效
+        """
+        table = self._table(domain, intent)
+        try:
+            return table is not None and value in table[0].get(slot_name, {})
+        except TypeError:
+            return False
+
+    def lookup_value(self, value):
+        """
+        反向查找取值可能所属的领域、意图和槽位
+
+        Args:
+            value: 槽位取值，如"供电所"
+
+        Returns:
+            list: [{"domain", "intent", "slots"}]，slots为包含该取值的槽位名称列表
+        """
+        try:
+            candidates = self._values_index().get(value, {})
+        except TypeError:
+            return []
+        return [{"domain": domain, "intent": intent, "slots": list(slot_names)}
+                for (domain, intent), slot_names in candidates.items()]
+
+    def missing_slots(self, domain, intent, user_slots):
+        """
+        根据用户已填的槽位，找出与之相容的槽位组合中尚未填写的槽位及可选取值，用于追问缺失槽位
+
+        Args:
+            domain: 领域
+            intent: 意图
+            user_slots: 用户已填的槽位
+
+        Returns:
+            dict: 槽位名称 -> 可选取值列表，领域意图不存在时返回None
+        """
+        table = self._table(domain, intent)
+        if table is None:
+            return None
+        ordered_values, combinations = table
+
+        user_slots = user_slots or {}
+        missing = {}
+        for combination in combinations:
+            # 用户已填的槽位都必须属于该组合且取值有效
+            try:
+                compatible = all(slot_name in combination and value in combination[slot_name]
+                                 for slot_name, value in user_slots.items())
+            except TypeError:
+                compatible = False
+            if not compatible:
+                continue
+            for slot_name, values in combination.items():
+                if slot_name not in user_slots:
+                    missing.setdefault(slot_name, {}).update(dict.fromkeys(values))
+        # 按索引中的取值顺序输出
+        return {slot_name: [value for value in ordered_values[slot_name] if value in values]
+                for slot_name, values in missing.items()}
+
+    def stats(self):
+        """
+        获取索引规模，取值数需要建立反向索引
+
+        Returns:
+            dict: 行数、领域数、领域意图数、取值数
+        """
+        return {
+            "rows": len(self.rows),
+            "domains": len(self._rows_by_key),
+            "domain_intents": sum(len(intents) for intents in self._rows_by_key.values()),
+            "values": len(self._values_index())
+        }
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _default_dependency_path():
+    # 可通过环境变量DEPENDENCY_FILE_PATH指定依赖文件
+    if os.environ.get("DEPENDENCY_FILE_PATH"):
+        return os.environ["DEPENDENCY_FILE_PATH"]
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, "dependency.json")
+
+
+def get_dependency_index(dependency_file_path=None):
+    """
+    获取依赖文件对应的进程级索引，首次调用时加载
+
+    Args:
+        dependency_file_path: 依赖文件路径，默认为当前目录下的dependency.json
+
+    Returns:
+        DependencyIndex: 依赖索引
+    """
+    if dependency_file_path is None:
+        dependency_file_path = _default_dependency_path()
+    key = os.path.abspath(dependency_file_path)
+    index = _indexes.get(key)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(key)
+            if index is None:
+                index = DependencyIndex(key)
+                _indexes[key] = index
+    return index
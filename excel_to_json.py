@@ -1,19 +1,69 @@
 import os
 import json
-import pandas as pd
+import argparse
+import hashlib
+import io
 import re
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 
 current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 question_template_name = '问题模板20250304_beautifuler.xlsx'
 output_json_name = 'dependency.json'
 necessary_heads = ["domain","intent","可替换值"]
+manifest_version = 1
 
-def read_excel():
-    excel_file_path = os.path.join(current_dir, question_template_name)
+# 与pandas.read_excel默认识别的缺失值保持一致，保证流式模式与pandas模式结果相同
+na_values = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+             "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"}
+
+def read_excel(excel_file_path=None):
+    import pandas as pd
+    if excel_file_path is None:
+        excel_file_path = os.path.join(current_dir, question_template_name)
     dfs = pd.read_excel(excel_file_path,sheet_name=None)
     return dfs
 
+def parse_slots(slots_str):
+    """
+    解析可替换值单元格中的slots
+    
+    Args:
+        slots_str: 单元格内容
+    
+    Returns:
+        解析后的JSON对象
+    
+    Raises:
+        json.JSONDecodeError: 内容不是有效的JSON
+    """
+    # 如果slots_str已经是字典类型，则不需要解析
+    if isinstance(slots_str, dict):
+        return slots_str
+    
+    # 确保slots_str是字符串类型
+    slots_str = str(slots_str)
+    
+    # 尝试处理单引号的情况
+    try:
+        # 先尝试标准JSON解析
+        return json.loads(slots_str)
+    except json.JSONDecodeError:
+        # 如果失败，尝试将单引号替换为双引号并解析
+        # 使用正则表达式替换单引号为双引号，但避免替换已经转义的单引号
+        # 先将字符串中的双引号转义
+        slots_str = slots_str.replace('\\"', '____DOUBLEQUOTE____')
+        # 将单引号替换为双引号
+        slots_str = slots_str.replace("'", '"')
+        # 恢复原来的转义双引号
+        slots_str = slots_str.replace('____DOUBLEQUOTE____', '\\"')
+        # 再次尝试解析，如果仍然失败，抛出异常
+        return json.loads(slots_str)
+
 def parse_excecl(dfs):
+    import pandas as pd
     result = []
     for sheet_name,df in dfs.items():
         try:
@@ -40,32 +90,7 @@ def parse_excecl(dfs):
                     continue
                 
                 try:
-                    # 如果slots_str已经是字典类型，则不需要解析
-                    if isinstance(slots_str, dict):
-                        slots = slots_str
-                    else:
-                        # 确保slots_str是字符串类型
-                        slots_str = str(slots_str)
-                        
-                        # 尝试处理单引号的情况
-                        try:
-                            # 先尝试标准JSON解析
-                            slots = json.loads(slots_str)
-                        except json.JSONDecodeError:
-                            # 如果失败，尝试将单引号替换为双引号并解析
-                            try:
-                                # 使用正则表达式替换单引号为双引号，但避免替换已经转义的单引号
-                                # 先将字符串中的双引号转义
-                                slots_str = slots_str.replace('\\"', '____DOUBLEQUOTE____')
-                                # 将单引号替换为双引号
-                                slots_str = slots_str.replace("'", '"')
-                                # 恢复原来的转义双引号
-                                slots_str = slots_str.replace('____DOUBLEQUOTE____', '\\"')
-                                # 再次尝试解析
-                                slots = json.loads(slots_str)
-                            except json.JSONDecodeError:
-                                # 如果仍然失败，抛出异常
-                                raise
+                    slots = parse_slots(slots_str)
                     
                     result.append({
                         "domain": domain,
@@ -87,10 +112,419 @@ def parse_excecl(dfs):
     return result
 
 
+def _is_missing(value):
+    """
+    判断单元格是否为空，规则与pandas.isna一致
+    """
+    if value is None:
+        return True
+    if isinstance(value, float) and value != value:
+        return True
+    return isinstance(value, str) and value in na_values
+
+class JsonArrayWriter:
+    def __init__(self, f):
+        """
+        逐条写出JSON数组，输出与json.dump(result, f, ensure_ascii=False, indent=4)完全一致
+        
+        Args:
+            f: 以文本模式打开的输出文件
+        """
+        self.f = f
+        self.count = 0
+        # 已写出的字符数（换行符转换前），用于记录每个sheet的记录在输出中的位置
+        self.position = 0
+        self._write("[")
+    
+    def _write(self, text):
+        self.f.write(text)
+        self.position += len(text)
+    
+    def write(self, record):
+        text = json.dumps(record, ensure_ascii=False, indent=4)
+        # 数组元素整体再缩进一层；json.dumps会转义字符串中的换行，按行拆分是安全的
+        self._write(("," if self.count else "") + "\n    " + text.replace("\n", "\n    "))
+        self.count += 1
+    
+    def next_start(self):
+        """
+        下一条记录（不含前导逗号）在输出中的起始位置
+        """
+        return self.position + (1 if self.count else 0)
+    
+    def write_raw(self, text, count):
+        """
+        写出从已有输出中截取的连续多条记录
+        
+        Args:
+            text: 已序列化的记录文本，即同一JsonArrayWriter写出的连续记录，不含首尾逗号
+            count: 文本中的记录条数
+        """
+        if count:
+            self._write(("," if self.count else "") + text)
+            self.count += count
+    
+    def close(self):
+        self._write("\n]" if self.count else "]")
+
+def iter_sheet_records(sheet_name, rows, stats):
+    """
+    逐行解析一个sheet，按行产出记录
+    
+    Args:
+        sheet_name: sheet名称
+        rows: 行迭代器，第一行为表头，每行为单元格值的元组
+        stats: 该sheet的统计信息，解析过程中更新
+    
+    Yields:
+        dict: 解析后的记录
+    """
+    header = next(rows, None) or ()
+    column_names = list(header)
+    if not all(column_name in column_names for column_name in necessary_heads):
+        print(f"sheet {sheet_name} 缺少必要的列名")
+        stats["status"] = "缺少必要的列名"
+        return
+    
+    # 重名列取第一列，与pandas保持一致
+    domain_col, intent_col, slots_col = (column_names.index(head) for head in necessary_heads)
+    width = max(domain_col, intent_col, slots_col) + 1
+    
+    # 末尾的整行空白与pandas一样不计入数据行
+    blank_rows = 0
+    for row_number, row in enumerate(rows, 2):
+        if all(value is None or value == "" for value in row):
+            blank_rows += 1
+            continue
+        stats["rows"] += blank_rows + 1
+        stats["skipped"] += blank_rows
+        blank_rows = 0
+        
+        if len(row) < width:
+            row = tuple(row) + (None,) * (width - len(row))
+        domain = row[domain_col]
+        intent = row[intent_col]
+        slots_str = row[slots_col]
+        
+        # 检查必要列是否为空
+        if _is_missing(domain) or _is_missing(intent) or _is_missing(slots_str):
+            stats["skipped"] += 1
+            continue
+        
+        try:
+            slots = parse_slots(slots_str)
+        except json.JSONDecodeError:
+            # 如果JSON解析失败，记录错误并跳过该行
+            print(f"  行 {row_number}: slots字段不是有效的JSON格式: {slots_str}")
+            stats["invalid_json"] += 1
+            continue
+        
+        stats["records"] += 1
+        yield {
+            "domain": domain,
+            "intent": intent,
+            "slots": slots  # 这里存储的是JSON对象，而不是字符串
+        }
+    stats["status"] = "成功"
+
+def new_sheet_stats(sheet_name):
+    return {"sheet": sheet_name, "rows": 0, "records": 0, "skipped": 0, "invalid_json": 0, "status": ""}
+
+def iter_worksheet_records(worksheet, stats):
+    """
+    解析一个只读模式打开的worksheet，按行产出记录并打印解析日志
+    
+    Args:
+        worksheet: openpyxl只读worksheet
+        stats: 该sheet的统计信息，解析过程中更新
+    
+    Yields:
+        dict: 解析后的记录
+    """
+    print("------------------------------------")
+    print(f"开始解析sheet {worksheet.title}")
+    try:
+        # 只读模式下部分文件记录的表格范围不准确，重置后按实际内容遍历
+        worksheet.reset_dimensions()
+        rows = worksheet.iter_rows(values_only=True)
+        yield from iter_sheet_records(worksheet.title, rows, stats)
+    except Exception as e:
+        print(f"解析sheet {worksheet.title} 失败: {e}")
+        stats["status"] = f"失败: {e}"
+        print("------------------------------------")
+        return
+    if stats["status"] == "成功":
+        print(f"解析sheet {worksheet.title} 成功，跳过了 {stats['skipped']} 行空数据，{stats['invalid_json']} 行无效JSON数据")
+    print("------------------------------------")
+
+# 子进程内打开的工作簿，每个进程只加载一次共享字符串表
+_worker_workbook = None
+
+def _init_sheet_worker(excel_file_path):
+    global _worker_workbook
+    import openpyxl
+    _worker_workbook = openpyxl.load_workbook(excel_file_path, read_only=True, data_only=True)
+
+def parse_sheet_worker(sheet_name):
+    """
+    在子进程中解析单个sheet
+    
+    Args:
+        sheet_name: sheet名称
+    
+    Returns:
+        tuple: (记录列表, 统计信息, 解析日志)，日志由主进程按sheet顺序打印，避免多进程输出交错
+    """
+    stats = new_sheet_stats(sheet_name)
+    log = io.StringIO()
+    with redirect_stdout(log):
+        records = list(iter_worksheet_records(_worker_workbook[sheet_name], stats))
+    return records, stats, log.getvalue()
+
+def stream_excel_to_json(excel_file_path, output_file_path, workers=1):
+    """
+    以只读方式逐sheet、逐行读取Excel并增量写出JSON，内存占用与工作簿大小无关
+    
+    Args:
+        excel_file_path: Excel文件路径
+        output_file_path: 输出JSON文件路径
+        workers: 并行解析sheet的进程数，大于1时按sheet分发到进程池，结果仍按原sheet顺序写出
+    
+    Returns:
+        list: 每个sheet的统计信息
+    """
+    import openpyxl
+    
+    sheet_stats = []
+    workbook = openpyxl.load_workbook(excel_file_path, read_only=True, data_only=True)
+    # 先写临时文件，完成后再替换，避免中途失败留下不完整的输出
+    tmp_file_path = output_file_path + ".tmp"
+    try:
+        with open(tmp_file_path, 'w', encoding='utf-8') as f:
+            writer = JsonArrayWriter(f)
+            if workers > 1:
+                sheet_names = workbook.sheetnames
+                workbook.close()
+                with ProcessPoolExecutor(max_workers=min(workers, len(sheet_names) or 1),
+                                         initializer=_init_sheet_worker, initargs=(excel_file_path,)) as executor:
+                    # map按提交顺序返回结果，输出与串行解析逐字节一致
+                    for records, stats, log in executor.map(parse_sheet_worker, sheet_names):
+                        print(log, end="")
+                        sheet_stats.append(stats)
+                        for record in records:
+                            writer.write(record)
+            else:
+                for worksheet in workbook.worksheets:
+                    stats = new_sheet_stats(worksheet.title)
+                    sheet_stats.append(stats)
+                    for record in iter_worksheet_records(worksheet, stats):
+                        writer.write(record)
+            writer.close()
+        os.replace(tmp_file_path, output_file_path)
+    finally:
+        workbook.close()
+        if os.path.exists(tmp_file_path):
+            os.remove(tmp_file_path)
+    return sheet_stats
+
+def _file_digest(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def read_raw_fingerprints(excel_file_path):
+    """
+    读取xlsx压缩包中每个sheet的原始XML摘要，无需解析单元格
+    
+    Args:
+        excel_file_path: Excel文件路径
+    
+    Returns:
+        tuple: ({sheet名称: sheet XML摘要}, 共享部件摘要)。共享字符串、样式和工作簿设置变化会影响所有sheet的单元格值
+    """
+    main_ns = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+    rel_ns = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+    package_rel_ns = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+    
+    with zipfile.ZipFile(excel_file_path) as archive:
+        names = set(archive.namelist())
+        rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+        targets = {}
+        for rel in rels.iter(f"{package_rel_ns}Relationship"):
+            target = rel.get("Target")
+            targets[rel.get("Id")] = target.lstrip("/") if target.startswith("/") else "xl/" + target
+        
+        sheet_digests = {}
+        workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+        for sheet in workbook.iter(f"{main_ns}sheet"):
+            sheet_path = targets.get(sheet.get(f"{rel_ns}id"))
+            if sheet_path in names:
+                sheet_digests[sheet.get("name")] = hashlib.sha256(archive.read(sheet_path)).hexdigest()
+        
+        shared = hashlib.sha256()
+        for part in ("xl/workbook.xml", "xl/sharedStrings.xml", "xl/styles.xml"):
+            if part in names:
+                shared.update(archive.read(part))
+    return sheet_digests, shared.hexdigest()
+
+def load_manifest(manifest_file_path, output_file_path):
+    """
+    读取增量构建清单，清单与当前输出文件不一致时视为无效
+    
+    Args:
+        manifest_file_path: 清单文件路径
+        output_file_path: 输出JSON文件路径
+    
+    Returns:
+        dict: 清单内容，无效时返回None
+    """
+    try:
+        with open(manifest_file_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("version") != manifest_version:
+            return None
+        if manifest.get("output_digest") != _file_digest(output_file_path):
+            print("输出文件在上次构建后被修改，执行全量构建")
+            return None
+        return manifest
+    except (OSError, ValueError):
+        return None
+
+def incremental_excel_to_json(excel_file_path, output_file_path, manifest_file_path=None):
+    """
+    增量构建：只重新解析内容发生变化的sheet，未变化sheet的记录直接从已有输出中复用
+    
+    每个sheet记录两级指纹：sheet XML原始摘要（连同共享字符串等共享部件摘要）无需解析单元格即可判断未变化；
+    原始摘要不同时再计算单元格值摘要，值相同的sheet仍复用已有记录。
+    
+    Args:
+        excel_file_path: Excel文件路径
+        output_file_path: 输出JSON文件路径
+        manifest_file_path: 清单文件路径，默认为输出文件路径加.manifest.json
+    
+    Returns:
+        list: 每个sheet的统计信息
+    """
+    import openpyxl
+    
+    if manifest_file_path is None:
+        manifest_file_path = output_file_path + ".manifest.json"
+    
+    manifest = load_manifest(manifest_file_path, output_file_path)
+    previous_sheets = {}
+    previous_text = ""
+    if manifest is not None:
+        # 文本模式读取，换行符与写出时的位置计数一致
+        with open(output_file_path, 'r', encoding='utf-8') as f:
+            previous_text = f.read()
+        previous_sheets = {entry["sheet"]: entry for entry in manifest["sheets"]}
+    
+    raw_digests, shared_digest = read_raw_fingerprints(excel_file_path)
+    shared_unchanged = manifest is not None and manifest.get("shared_digest") == shared_digest
+    
+    sheet_stats = []
+    manifest_sheets = []
+    workbook = openpyxl.load_workbook(excel_file_path, read_only=True, data_only=True)
+    tmp_file_path = output_file_path + ".tmp"
+    try:
+        with open(tmp_file_path, 'w', encoding='utf-8') as f:
+            writer = JsonArrayWriter(f)
+            for worksheet in workbook.worksheets:
+                stats = new_sheet_stats(worksheet.title)
+                sheet_stats.append(stats)
+                previous = previous_sheets.get(worksheet.title)
+                raw_digest = raw_digests.get(worksheet.title)
+                
+                if previous is not None and shared_unchanged and previous["raw_digest"] == raw_digest:
+                    values_digest = previous["values_digest"]
+                    rows = None
+                else:
+                    worksheet.reset_dimensions()
+                    rows = list(worksheet.iter_rows(values_only=True))
+                    values = hashlib.sha256()
+                    for row in rows:
+                        values.update(repr(row).encode('utf-8'))
+                        values.update(b"\n")
+                    values_digest = values.hexdigest()
+                
+                start = writer.next_start()
+                if previous is not None and previous["values_digest"] == values_digest:
+                    # 内容未变化，直接拼接上次输出中该sheet的记录文本，无需重新序列化
+                    writer.write_raw(previous_text[previous["start"]:previous["end"]], previous["records"])
+                    stats.update({key: previous[key] for key in ("rows", "records", "skipped", "invalid_json")})
+                    stats["status"] = "未变化"
+                    print(f"sheet {worksheet.title} 未变化，复用 {previous['records']} 条记录")
+                else:
+                    print("------------------------------------")
+                    print(f"开始解析sheet {worksheet.title}")
+                    try:
+                        for record in iter_sheet_records(worksheet.title, iter(rows), stats):
+                            writer.write(record)
+                    except Exception as e:
+                        print(f"解析sheet {worksheet.title} 失败: {e}")
+                        stats["status"] = f"失败: {e}"
+                    if stats["status"] == "成功":
+                        print(f"解析sheet {worksheet.title} 成功，跳过了 {stats['skipped']} 行空数据，{stats['invalid_json']} 行无效JSON数据")
+                    print("------------------------------------")
+                
+                manifest_sheets.append({
+                    "sheet": worksheet.title,
+                    "raw_digest": raw_digest,
+                    "values_digest": values_digest,
+                    "rows": stats["rows"],
+                    "records": stats["records"],
+                    "skipped": stats["skipped"],
+                    "invalid_json": stats["invalid_json"],
+                    "start": start if stats["records"] else writer.position,
+                    "end": writer.position
+                })
+            writer.close()
+        os.replace(tmp_file_path, output_file_path)
+    finally:
+        workbook.close()
+        if os.path.exists(tmp_file_path):
+            os.remove(tmp_file_path)
+    
+    with open(manifest_file_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "version": manifest_version,
+            "shared_digest": shared_digest,
+            "output_digest": _file_digest(output_file_path),
+            "sheets": manifest_sheets
+        }, f, ensure_ascii=False, indent=4)
+    return sheet_stats
+
+def print_sheet_stats(sheet_stats):
+    """
+    打印每个sheet的统计信息
+    """
+    print("sheet统计：")
+    for stats in sheet_stats:
+        print(f"  {stats['sheet']}: {stats['status']}，数据行 {stats['rows']}，记录 {stats['records']}，"
+              f"空数据 {stats['skipped']}，无效JSON {stats['invalid_json']}")
+    print(f"共输出 {sum(stats['records'] for stats in sheet_stats)} 条记录")
+
+
 if __name__ == '__main__':
-    dfs = read_excel()
-    result = parse_excecl(dfs)
-    output_file_path = os.path.join(current_dir, output_json_name)
-    with open(output_file_path,'w',encoding='utf-8') as f:
-        json.dump(result,f,ensure_ascii=False,indent=4)
-        print(f"转换完成，结果已保存至 {output_file_path}")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="将问题模板Excel转换为dependency.json")
+    parser.add_argument("--stream", action="store_true", help="流式读取Excel并增量写出JSON，内存占用不随工作簿增长")
+    parser.add_argument("--workers", type=int, default=1, help="并行解析sheet的进程数，大于1时使用流式解析")
+    parser.add_argument("--incremental", action="store_true", help="只重新解析内容变化的sheet，指纹保存在输出文件旁的.manifest.json中")
+    parser.add_argument("--input", default=os.path.join(current_dir, question_template_name), help="Excel文件路径")
+    parser.add_argument("--output", default=os.path.join(current_dir, output_json_name), help="输出JSON文件路径")
+    args = parser.parse_args()
+    
+    output_file_path = args.output
+    if args.incremental:
+        sheet_stats = incremental_excel_to_json(args.input, output_file_path)
+        print_sheet_stats(sheet_stats)
+        print(f"转换完成，结果已保存至 {output_file_path}")
+    elif args.stream or args.workers > 1:
+        sheet_stats = stream_excel_to_json(args.input, output_file_path, workers=args.workers)
+        print_sheet_stats(sheet_stats)
+        print(f"转换完成，结果已保存至 {output_file_path}")
+    else:
+        dfs = read_excel(args.input)
+        result = parse_excecl(dfs)
+        with open(output_file_path,'w',encoding='utf-8') as f:
+            json.dump(result,f,ensure_ascii=False,indent=4)
+            print(f"转换完成，结果已保存至 {output_file_path}")
\ No newline at end of file
@@ -0,0 +1,320 @@
+import os
+import json
+import argparse
+
+import openpyxl
+
+from json_to_excel import HEADERS
+from template_parser import VARIABLE_PATTERN
+
+# 模板变量可引用的用户数据顶层字段，与api.UserData一致
+USER_FIELDS = {"org", "time", "origin_slot", "last_slot", "result", "order", "cur_domain", "lead_add", "last_option"}
+
+# 条件两侧及其在表格中的列（从0开始）：领域、意图、槽位
+SIDE_COLUMNS = {"origin_slot": (3, 4, 5), "last_slot": (6, 7, 8)}
+
+
+def _text(value):
+    """
+    将单元格值转换为去除首尾空白的文本，空单元格返回空字符串
+    """
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _lines(value):
+    """
+    将换行拼接的单元格内容拆分为非空行
+    """
+    return [line.strip() for line in _text(value).splitlines() if line.strip()]
+
+
+def parse_slots_text(value):
+    """
+    解析json_to_excel写入的槽位文本，每行一个"槽位: 值"
+
+    Args:
+        value: 单元格值
+
+    Returns:
+        tuple: (槽位列表, 错误信息列表)
+    """
+    slots = []
+    errors = []
+    for line in _lines(value):
+        key, sep, slot_value = line.partition(":")
+        if not sep:
+            # 兼容中文冒号
+            key, sep, slot_value = line.partition("：")
+        key = key.strip()
+        if not sep or not key:
+            errors.append(f"槽位格式错误，应为\"槽位: 值\": {line}")
+            continue
+        slots.append({key: slot_value.strip()})
+    return slots, errors
+
+
+def row_to_template(row):
+    """
+    将Excel中的一行还原为模板，是json_to_excel.template_to_row的逆过程
+
+    Args:
+        row: 与HEADERS对应的单元格值
+
+    Returns:
+        tuple: (模板, 错误信息列表)
+    """
+    row = list(row) + [None] * (len(HEADERS) - len(row))
+    errors = []
+
+    template = {"name": _text(row[0])}
+    priority = _text(row[1])
+    if priority:
+        template["priority"] = priority
+    template["examples"] = _lines(row[2])
+
+    conditions = {}
+    for side, (domain_col, intent_col, slots_col) in SIDE_COLUMNS.items():
+        domains = _lines(row[domain_col])
+        intents = _lines(row[intent_col])
+        slots, slot_errors = parse_slots_text(row[slots_col])
+        errors.extend(f"{side}: {error}" for error in slot_errors)
+        # 三列都为空表示模板没有该侧条件
+        if domains or intents or slots or slot_errors:
+            conditions[side] = {"domain": domains, "intent": intents, "slots": slots}
+    template["conditions"] = conditions
+    # 模板内容保留原样
+    template["content"] = row[9] if isinstance(row[9], str) else _text(row[9])
+    return template, errors
+
+
+def validate_template(template):
+    """
+    校验模板，错误会导致模板无法匹配或渲染出错，警告可能导致渲染出"未知"
+
+    Args:
+        template: 模板
+
+    Returns:
+        tuple: (错误信息列表, 警告信息列表)
+    """
+    errors = []
+    warnings = []
+    if not template["name"]:
+        errors.append("模板名称为空")
+    if "priority" in template:
+        try:
+            int(template["priority"])
+        except ValueError:
+            errors.append(f"优先级不是整数: {template['priority']}")
+    if not template["conditions"]:
+        warnings.append("没有任何匹配条件，将匹配所有请求")
+
+    slot_names = {}
+    for side, condition in template["conditions"].items():
+        if not condition["domain"]:
+            errors.append(f"{side}: 领域为空，模板永远无法匹配")
+        if not condition["intent"]:
+            errors.append(f"{side}: 意图为空，模板永远无法匹配")
+        names = [next(iter(slot_dict)) for slot_dict in condition["slots"]]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            warnings.append(f"{side}: 槽位重复: {', '.join(duplicates)}")
+        slot_names[side] = set(names)
+
+    content = template["content"]
+    if not content:
+        errors.append("模板内容为空")
+    if content.count("{{") != content.count("}}"):
+        warnings.append("模板内容中的{{和}}数量不一致")
+    for match in VARIABLE_PATTERN.findall(content):
+        path = match.strip().split('.')
+        if path[0] not in USER_FIELDS:
+            warnings.append(f"变量{{{{{match}}}}}引用了未知字段 {path[0]}")
+        elif path[0] in SIDE_COLUMNS and len(path) >= 3 and path[1] == "slots":
+            # 引用的槽位不在匹配条件中时，请求可能不带该槽位
+            if path[2] not in slot_names.get(path[0], set()):
+                warnings.append(f"变量{{{{{match}}}}}引用的槽位 {path[2]} 不在{path[0]}的槽位条件中")
+    return errors, warnings
+
+
+def iter_excel_templates(excel_file_path, sheet_name="模板数据"):
+    """
+    以只读模式逐行读取Excel并还原模板
+
+    Args:
+        excel_file_path: Excel文件路径
+        sheet_name: 工作表名称，不存在时使用第一个工作表
+
+    Returns:
+        generator: 逐行产出(行号, 模板, 错误信息列表, 警告信息列表)
+    """
+    wb = openpyxl.load_workbook(excel_file_path, read_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name in wb.sheetnames else wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        header = [_text(value) for value in next(rows, ())][:len(HEADERS)]
+        if header != HEADERS:
+            raise ValueError(f"表头与json_to_excel导出的格式不一致: {header}")
+
+        for row_idx, row in enumerate(rows, 2):
+            if all(_text(value) == "" for value in row):
+                continue
+            template, errors = row_to_template(row[:len(HEADERS)])
+            validate_errors, warnings = validate_template(template)
+            yield row_idx, template, errors + validate_errors, warnings
+    finally:
+        wb.close()
+
+
+def _template_keys(templates):
+    """
+    为模板生成比较用的键：模板名称可以重复，按出现次序区分
+    """
+    counts = {}
+    keys = []
+    for template in templates:
+        name = template.get("name", "")
+        counts[name] = counts.get(name, 0) + 1
+        keys.append(name if counts[name] == 1 else f"{name}#{counts[name]}")
+    return keys
+
+
+def _diff_values(old, new, path, changes):
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in list(old) + [key for key in new if key not in old]:
+            sub_path = f"{path}.{key}" if path else key
+            if key not in new:
+                changes.append((sub_path, old[key], None))
+            elif key not in old:
+                changes.append((sub_path, None, new[key]))
+            else:
+                _diff_values(old[key], new[key], sub_path, changes)
+    elif old != new:
+        changes.append((path, old, new))
+
+
+def diff_templates(old_templates, new_templates):
+    """
+    按模板比较结构差异
+
+    Args:
+        old_templates: 当前模板列表
+        new_templates: 导入的模板列表
+
+    Returns:
+        dict: added/removed为模板键列表，modified为 模板键 -> [(字段路径, 旧值, 新值)]，moved表示顺序是否变化
+    """
+    old_by_key = dict(zip(_template_keys(old_templates), old_templates))
+    new_by_key = dict(zip(_template_keys(new_templates), new_templates))
+    modified = {}
+    for key, new_template in new_by_key.items():
+        if key in old_by_key:
+            changes = []
+            _diff_values(old_by_key[key], new_template, "", changes)
+            if changes:
+                modified[key] = changes
+    common_old = [key for key in old_by_key if key in new_by_key]
+    common_new = [key for key in new_by_key if key in old_by_key]
+    return {
+        "added": [key for key in new_by_key if key not in old_by_key],
+        "removed": [key for key in old_by_key if key not in new_by_key],
+        "modified": modified,
+        "moved": common_old != common_new
+    }
+
+
+def print_diff(diff):
+    for key in diff["added"]:
+        print(f"+ 新增模板 {key}")
+    for key in diff["removed"]:
+        print(f"- 删除模板 {key}")
+    for key, changes in diff["modified"].items():
+        print(f"~ 修改模板 {key}")
+        for path, old, new in changes:
+            print(f"    {path}: {json.dumps(old, ensure_ascii=False)} -> {json.dumps(new, ensure_ascii=False)}")
+    if diff["moved"]:
+        print("* 模板顺序有变化")
+    if not (diff["added"] or diff["removed"] or diff["modified"] or diff["moved"]):
+        print("模板没有变化")
+
+
+def excel_to_template(excel_file_path, template_file_path, base_file_path=None, dry_run=False, force=False):
+    """
+    将json_to_excel导出并编辑过的Excel导入为模板JSON
+
+    Args:
+        excel_file_path: Excel文件路径
+        template_file_path: 输出的模板JSON文件路径
+        base_file_path: 比较差异使用的当前模板文件，默认与输出文件相同
+        dry_run: 只校验和比较差异，不写入文件
+        force: 存在错误时仍然写入
+
+    Returns:
+        bool: 是否成功（dry_run时表示校验是否通过）
+    """
+    templates = []
+    error_count = 0
+    try:
+        for row_idx, template, errors, warnings in iter_excel_templates(excel_file_path):
+            for error in errors:
+                print(f"第{row_idx}行 {template['name']} 错误: {error}")
+            for warning in warnings:
+                print(f"第{row_idx}行 {template['name']} 警告: {warning}")
+            error_count += len(errors)
+            templates.append(template)
+    except Exception as e:
+        print(f"读取Excel文件失败: {e}")
+        return False
+    print(f"共读取 {len(templates)} 个模板，{error_count} 个错误")
+
+    if base_file_path is None:
+        base_file_path = template_file_path
+    if os.path.exists(base_file_path):
+        try:
+            with open(base_file_path, 'r', encoding='utf-8') as f:
+                print_diff(diff_templates(json.load(f), templates))
+        except Exception as e:
+            print(f"加载模板文件失败: {e}")
+
+    if dry_run:
+        return error_count == 0
+    if error_count and not force:
+        print("存在错误，未写入模板文件，可使用--force强制写入")
+        return False
+
+    # 先写临时文件再替换，运行中的服务热加载时不会读到写了一半的文件
+    tmp_file_path = template_file_path + ".tmp"
+    try:
+        with open(tmp_file_path, 'w', encoding='utf-8') as f:
+            json.dump(templates, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_file_path, template_file_path)
+    except Exception as e:
+        print(f"保存模板文件失败: {e}")
+        if os.path.exists(tmp_file_path):
+            os.remove(tmp_file_path)
+        return False
+    print(f"模板文件已保存至: {template_file_path}")
+    return True
+
+
+def main():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="将json_to_excel导出的Excel文件导入为模板JSON")
+    parser.add_argument("--input", default=os.path.join(current_dir, "template.xlsx"), help="Excel文件路径")
+    parser.add_argument("--output", default=os.path.join(current_dir, "template.json"), help="模板JSON文件路径")
+    parser.add_argument("--base", help="比较差异使用的模板文件，默认与输出文件相同")
+    parser.add_argument("--dry-run", action="store_true", help="只校验和显示差异，不写入文件")
+    parser.add_argument("--force", action="store_true", help="存在错误时仍然写入")
+    args = parser.parse_args()
+
+    success = excel_to_template(args.input, args.output, args.base, args.dry_run, args.force)
+    print("导入完成！" if success else "导入失败！")
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,9 +1,57 @@
 import json
 import os
+import argparse
 import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, NamedStyle
 from openpyxl.utils import get_column_letter
 
+# 表头
+HEADERS = ["模板名称", "优先级", "示例", "领域(origin)", "意图(origin)", "槽位(origin)",
+           "领域(last)", "意图(last)", "槽位(last)", "模板内容"]
+
+# 匹配覆盖表头
+COVERAGE_HEADERS = ["模板名称", "匹配顺序", "索引键数", "可命中的依赖组合数", "优先命中的依赖组合数", "优先命中示例"]
+# 匹配覆盖工作表中每个模板最多列出的优先命中示例数
+COVERAGE_EXAMPLES = 5
+
+def _slots_text(slots):
+    """
+    将槽位列表转换为每行一个"槽位: 值"的文本
+    """
+    slots_text = []
+    for slot_dict in slots:
+        for key, value in slot_dict.items():
+            slots_text.append(f"{key}: {value}")
+    return "\n".join(slots_text)
+
+def template_to_row(template):
+    """
+    将模板转换为Excel中的一行
+    
+    Args:
+        template: 模板
+        
+    Returns:
+        list: 与HEADERS对应的单元格值
+    """
+    conditions = template.get("conditions", {})
+    origin_slot = conditions.get("origin_slot", {})
+    last_slot = conditions.get("last_slot", {})
+    return [
+        template.get("name", ""),
+        template.get("priority", ""),
+        # 示例（可能有多个，用换行符连接）
+        "\n".join(template.get("examples", [])),
+        "\n".join(origin_slot.get("domain", [])),
+        "\n".join(origin_slot.get("intent", [])),
+        _slots_text(origin_slot.get("slots", [])),
+        "\n".join(last_slot.get("domain", [])),
+        "\n".join(last_slot.get("intent", [])),
+        _slots_text(last_slot.get("slots", [])),
+        template.get("content", "")
+    ]
+
 def json_to_excel(json_file_path, excel_file_path=None):
     """
     将template.json文件转换为Excel文件
@@ -30,8 +78,7 @@ def json_to_excel(json_file_path, excel_file_path=None):
     ws.title = "模板数据"
     
     # 设置表头
-    headers = ["模板名称", "优先级", "示例", "领域(origin)", "意图(origin)", "槽位(origin)", 
-              "领域(last)", "意图(last)", "槽位(last)", "模板内容"]
+    headers = HEADERS
     
     # 设置表头样式
     header_font = Font(bold=True, size=12)
@@ -48,44 +95,8 @@ def json_to_excel(json_file_path, excel_file_path=None):
     # 写入数据
     row_idx = 2
     for template in templates:
-        # 基本信息
-        ws.cell(row=row_idx, column=1, value=template.get("name", ""))
-        ws.cell(row=row_idx, column=2, value=template.get("priority", ""))
-        
-        # 示例（可能有多个，用换行符连接）
-        examples = "\n".join(template.get("examples", []))
-        ws.cell(row=row_idx, column=3, value=examples)
-        
-        # 条件信息
-        conditions = template.get("conditions", {})
-        
-        # origin_slot信息
-        origin_slot = conditions.get("origin_slot", {})
-        ws.cell(row=row_idx, column=4, value="\n".join(origin_slot.get("domain", [])))
-        ws.cell(row=row_idx, column=5, value="\n".join(origin_slot.get("intent", [])))
-        
-        # origin_slot的槽位（可能有多个，每个是一个字典）
-        origin_slots_text = []
-        for slot_dict in origin_slot.get("slots", []):
-            for key, value in slot_dict.items():
-                origin_slots_text.append(f"{key}: {value}")
-        ws.cell(row=row_idx, column=6, value="\n".join(origin_slots_text))
-        
-        # last_slot信息
-        last_slot = conditions.get("last_slot", {})
-        ws.cell(row=row_idx, column=7, value="\n".join(last_slot.get("domain", [])))
-        ws.cell(row=row_idx, column=8, value="\n".join(last_slot.get("intent", [])))
-        
-        # last_slot的槽位
-        last_slots_text = []
-        for slot_dict in last_slot.get("slots", []):
-            for key, value in slot_dict.items():
-                last_slots_text.append(f"{key}: {value}")
-        ws.cell(row=row_idx, column=9, value="\n".join(last_slots_text))
-        
-        # 模板内容
-        ws.cell(row=row_idx, column=10, value=template.get("content", ""))
-        
+        for col_idx, value in enumerate(template_to_row(template), 1):
+            ws.cell(row=row_idx, column=col_idx, value=value)
         row_idx += 1
     
     # 设置列宽
@@ -111,15 +122,149 @@ def json_to_excel(json_file_path, excel_file_path=None):
         print(f"保存Excel文件失败: {e}")
         return False
 
+def template_coverage(templates, dependency_rows):
+    """
+    统计每个模板在dependency.json各依赖组合上的匹配覆盖情况
+    
+    Args:
+        templates: 模板列表
+        dependency_rows: dependency.json中的依赖组合
+        
+    Returns:
+        list: 与模板列表顺序一致的覆盖信息，包含匹配顺序、索引键数、可命中及优先命中的依赖组合数，
+              以及最多COVERAGE_EXAMPLES个优先命中的依赖组合示例
+    """
+    # 只在导出覆盖信息时才需要模板解析器
+    from template_parser import TemplateParser
+    
+    parser = TemplateParser(templates=templates)
+    ordered = parser.ordered_templates()
+    index_keys = [len(keys) for keys in parser.index_keys()]
+    covered = [0] * len(ordered)
+    # 只保留计数和少量示例，内存不随依赖组合数增长
+    preferred = [0] * len(ordered)
+    examples = [[] for _ in ordered]
+    
+    for row in dependency_rows:
+        # 假设用户前后两轮停留在同一个领域意图下，槽位取依赖组合中的任意可选取值
+        slots = {slot_name: set(values if isinstance(values, list) else [values])
+                 for slot_name, values in row.get("slots", {}).items()}
+        side = {"domain": row.get("domain", ""), "intent": row.get("intent", ""), "slots": slots}
+        first = True
+        for order in parser.matching_orders(side):
+            covered[order] += 1
+            if first:
+                preferred[order] += 1
+                if len(examples[order]) < COVERAGE_EXAMPLES:
+                    examples[order].append(row)
+                first = False
+    
+    coverage_by_id = {}
+    for order, template in enumerate(ordered):
+        coverage_by_id[id(template)] = {
+            "order": order + 1,
+            "index_keys": index_keys[order],
+            "covered": covered[order],
+            "preferred": preferred[order],
+            "examples": examples[order]
+        }
+    return [coverage_by_id[id(template)] for template in templates]
+
+def bulk_json_to_excel(json_file_path, excel_file_path=None, coverage=False, dependency_file_path=None):
+    """
+    以只写模式流式导出模板，适合数千条以上的大模板库：
+    行写入后即落盘，样式为工作簿级命名样式，在写入时一次设置，内存占用不随单元格数增长
+    
+    Args:
+        json_file_path: JSON文件路径
+        excel_file_path: Excel文件路径，默认为JSON文件同目录下的同名Excel文件
+        coverage: 是否额外导出"匹配覆盖"工作表
+        dependency_file_path: 统计覆盖使用的dependency.json路径，默认为JSON文件同目录下的dependency.json
+    """
+    if excel_file_path is None:
+        excel_file_path = os.path.splitext(json_file_path)[0] + '.xlsx'
+    
+    try:
+        with open(json_file_path, 'r', encoding='utf-8') as f:
+            templates = json.load(f)
+    except Exception as e:
+        print(f"加载JSON文件失败: {e}")
+        return False
+    
+    wb = openpyxl.Workbook(write_only=True)
+    header_style = NamedStyle(
+        name="模板表头",
+        font=Font(bold=True, size=12),
+        fill=PatternFill(start_color="DDEBF7", end_color="DDEBF7", fill_type="solid"),
+        alignment=Alignment(horizontal='center', vertical='center', wrap_text=True)
+    )
+    data_style = NamedStyle(name="模板数据", alignment=Alignment(vertical='top', wrap_text=True))
+    wb.add_named_style(header_style)
+    wb.add_named_style(data_style)
+    
+    def styled_row(ws, values, style):
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.style = style
+            cells.append(cell)
+        return cells
+    
+    # 只写模式下列宽需在写入数据之前设置
+    ws = wb.create_sheet("模板数据")
+    for col_idx in range(1, len(HEADERS) + 1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = 40 if col_idx in [6, 9, 10] else 20
+    ws.append(styled_row(ws, HEADERS, header_style.name))
+    for template in templates:
+        ws.append(styled_row(ws, template_to_row(template), data_style.name))
+    
+    if coverage:
+        if dependency_file_path is None:
+            dependency_file_path = os.path.join(os.path.dirname(os.path.abspath(json_file_path)), "dependency.json")
+        try:
+            with open(dependency_file_path, 'r', encoding='utf-8') as f:
+                dependency_rows = json.load(f)
+        except Exception as e:
+            print(f"加载依赖文件失败: {e}")
+            return False
+        
+        coverage_ws = wb.create_sheet("匹配覆盖")
+        for col_idx, width in enumerate([30, 10, 10, 18, 18, 60], 1):
+            coverage_ws.column_dimensions[get_column_letter(col_idx)].width = width
+        coverage_ws.append(styled_row(coverage_ws, COVERAGE_HEADERS, header_style.name))
+        for template, info in zip(templates, template_coverage(templates, dependency_rows)):
+            examples = "\n".join(f"{row['domain']}/{row['intent']}: {', '.join(row['slots'])}"
+                                 for row in info["examples"])
+            coverage_ws.append(styled_row(coverage_ws, [template.get("name", ""), info["order"], info["index_keys"],
+                                                        info["covered"], info["preferred"], examples],
+                                          data_style.name))
+    
+    try:
+        wb.save(excel_file_path)
+        print(f"Excel文件已保存至: {excel_file_path}")
+        return True
+    except Exception as e:
+        print(f"保存Excel文件失败: {e}")
+        return False
+
 # 主函数
 def main():
     # 获取当前脚本所在目录
     current_dir = os.path.dirname(os.path.abspath(__file__))
-    json_file_path = os.path.join(current_dir, "template.json")
-    excel_file_path = os.path.join(current_dir, "template.xlsx")
     
-    # 转换JSON到Excel
-    success = json_to_excel(json_file_path, excel_file_path)
+    parser = argparse.ArgumentParser(description="将模板JSON文件转换为Excel文件")
+    parser.add_argument("--input", default=os.path.join(current_dir, "template.json"), help="模板JSON文件路径")
+    parser.add_argument("--output", default=os.path.join(current_dir, "template.xlsx"), help="Excel文件路径")
+    parser.add_argument("--bulk", action="store_true", help="以只写模式流式导出，适合大模板库")
+    parser.add_argument("--coverage", action="store_true", help="额外导出每个模板的匹配覆盖，隐含--bulk")
+    parser.add_argument("--dependency", help="统计匹配覆盖使用的dependency.json路径")
+    args = parser.parse_args()
+    
+    # 转换JSON到Excel，匹配覆盖只在流式导出中生成
+    if args.bulk or args.coverage:
+        success = bulk_json_to_excel(args.input, args.output, args.coverage, args.dependency)
+    else:
+        success = json_to_excel(args.input, args.output)
     
     if success:
         print("转换完成！")
@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from collections import Counter
+
+from benchmark import (default_dependency_path, load_distribution, generate_templates, generate_workload,
+                       summarize, format_result)
+
+
+def load_payloads(payload_file_path):
+    """
+    加载录制的请求数据，支持JSON数组或每行一条的NDJSON
+
+    Args:
+        payload_file_path: 请求数据文件路径
+
+    Returns:
+        list: 用户数据列表
+    """
+    with open(payload_file_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+async def run_load(send, payloads, concurrency, total=None, duration=None, rps=None):
+    """
+    以固定并发（可选固定速率）发送请求并统计结果
+
+    Args:
+        send: 发送单个请求的协程函数，返回HTTP状态码
+        payloads: 请求体列表，循环使用
+        concurrency: 并发数
+        total: 请求总数
+        duration: 持续时间（秒），与total同时指定时先达到者结束
+        rps: 每秒请求数上限，按开环方式计划每个请求的发送时间；为None时尽快发送。
+             指定时延迟从计划发送时间开始计算，服务跟不上时排队等待的时间计入延迟，不会因协调遗漏而低估
+
+    Returns:
+        dict: 吞吐量、延迟百分位、状态码及错误统计；指定rps时另含实际发送相对计划时间的滞后统计
+    """
+    latencies = []
+    lags = []
+    status_codes = Counter()
+    exceptions = Counter()
+    clock = time.perf_counter
+    started = clock()
+    started_ns = time.perf_counter_ns()
+    deadline = started + duration if duration else None
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while True:
+            # 协程在await之间不会被打断，序号分配无需加锁
+            index = next_index
+            if total is not None and index >= total:
+                return
+            if deadline is not None and clock() >= deadline:
+                return
+            next_index += 1
+            if rps:
+                scheduled = started_ns + int(index * 1e9 / rps)
+                delay = (scheduled - time.perf_counter_ns()) / 1e9
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                # 从计划时间开始计时：所有worker都在等待响应时，后续请求的排队时间同样算作延迟
+                start = scheduled
+                lags.append(max(0, time.perf_counter_ns() - start))
+            else:
+                start = time.perf_counter_ns()
+
+            try:
+                status = await send(payloads[index % len(payloads)])
+            except Exception as e:
+                status = "exception"
+                exceptions[type(e).__name__] += 1
+            latencies.append(time.perf_counter_ns() - start)
+            status_codes[status] += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = clock() - started
+
+    errors = sum(count for status, count in status_codes.items() if status == "exception" or status >= 400)
+    result = summarize("load", latencies, elapsed, seconds=elapsed, concurrency=concurrency, target_rps=rps,
+                       errors=errors, error_rate=errors / len(latencies) if latencies else 0.0,
+                       status_codes={str(status): count for status, count in status_codes.items()},
+                       exceptions=dict(exceptions))
+    if rps:
+        result["schedule_lag"] = summarize("schedule_lag", lags, elapsed)
+    return result
+
+
+def _batches(payloads, batch_size):
+    if batch_size <= 1:
+        return payloads
+    return [payloads[start:start + batch_size] for start in range(0, len(payloads), batch_size)]
+
+
+async def run_target(args, payloads):
+    """
+    按目标类型创建发送函数并执行压测：
+    url为已启动的服务；asgi在进程内直接调用FastAPI应用，不经过网络和uvicorn；
+    direct直接调用模板注册表，不经过FastAPI，与asgi对比可得出框架开销
+    """
+    path = "/parse_template/batch" if args.batch_size > 1 else "/parse_template"
+    bodies = _batches(payloads, args.batch_size)
+
+    async def measure(send):
+        if args.warmup:
+            await run_load(send, bodies, args.concurrency, total=args.warmup)
+        return await run_load(send, bodies, args.concurrency, args.requests, args.duration, args.rps)
+
+    if args.target == "direct":
+        from template_parser import get_registry
+
+        registry = get_registry()
+
+        async def send(body):
+            snapshot = registry.current_snapshot()
+            for payload in (body if args.batch_size > 1 else [body]):
+                registry.resolve(payload, snapshot)
+            return 200
+
+        return await measure(send)
+
+    try:
+        import httpx
+    except ImportError as e:
+        print(f"需要安装httpx才能发送HTTP请求: {e}")
+        return None
+
+    if args.target == "asgi":
+        import api
+
+        # 手动执行lifespan，预热模板并启动后台热加载任务
+        async with api.lifespan(api.app):
+            transport = httpx.ASGITransport(app=api.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+                async def send(body):
+                    response = await client.post(path, json=body)
+                    return response.status_code
+
+                return await measure(send)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        async def send(body):
+            response = await client.post(path, json=body)
+            return response.status_code
+
+        return await measure(send)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模板解析服务压测：回放录制的或按dependency.json合成的请求")
+    parser.add_argument("--target", choices=["url", "asgi", "direct"], default="url",
+                        help="url: 已启动的服务；asgi: 进程内调用FastAPI应用；direct: 直接调用模板注册表")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="服务地址")
+    parser.add_argument("--payloads", help="录制的请求数据（JSON数组或NDJSON），不指定时按dependency.json合成")
+    parser.add_argument("--dependency", default=default_dependency_path, help="合成请求使用的dependency.json路径")
+    parser.add_argument("--synthetic", type=int, default=2000, help="合成请求的数量")
+    parser.add_argument("--miss-ratio", type=float, default=0.1, help="合成请求中无法匹配的比例")
+    parser.add_argument("--templates", type=int,
+                        help="asgi/direct模式下按dependency.json合成指定数量的模板代替template.json")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发数")
+    parser.add_argument("--requests", type=int, help="请求总数")
+    parser.add_argument("--duration", type=float, help="持续时间（秒）")
+    parser.add_argument("--rps", type=float, help="每秒请求数上限，不指定时尽快发送")
+    parser.add_argument("--batch-size", type=int, default=1, help="大于1时使用批量接口，每个请求包含的数据条数")
+    parser.add_argument("--warmup", type=int, default=100, help="正式统计前的预热请求数")
+    parser.add_argument("--timeout", type=float, default=30.0, help="HTTP请求超时（秒）")
+    parser.add_argument("--output", help="压测结果JSON文件路径")
+    args = parser.parse_args()
+
+    if args.requests is None and args.duration is None:
+        args.requests = 5000
+
+    if args.payloads:
+        payloads = load_payloads(args.payloads)
+    else:
+        distribution = load_distribution(args.dependency)
+        payloads = generate_workload(distribution, args.synthetic, args.miss_ratio, args.seed)
+    if not payloads:
+        print("没有可发送的请求数据")
+        return 1
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.templates:
+            if args.target == "url":
+                print("url模式下模板由服务自身加载，忽略--templates")
+            else:
+                # 在首次导入模板注册表之前指定模板文件
+                template_file_path = os.path.join(workdir, "load_test_templates.json")
+                templates = generate_templates(load_distribution(args.dependency), args.templates, seed=args.seed)
+                with open(template_file_path, 'w', encoding='utf-8') as f:
+                    json.dump(templates, f, ensure_ascii=False)
+                os.environ["TEMPLATE_FILE_PATH"] = template_file_path
+        result = asyncio.run(run_target(args, payloads))
+    if result is None:
+        return 1
+
+    result["name"] = f"{args.target} {'批量' + str(args.batch_size) if args.batch_size > 1 else '单条'}"
+    print(format_result(result))
+    print(f"  请求 {result['count']}  错误 {result['errors']}（{result['error_rate']:.2%}）  "
+          f"状态码 {result['status_codes']}" + (f"  异常 {result['exceptions']}" if result["exceptions"] else ""))
+    if "schedule_lag" in result:
+        lag = result["schedule_lag"]
+        # 滞后较大说明并发数不足以维持目标速率，延迟中包含了排队时间
+        print(f"  发送滞后 p50 {lag['p50_us'] / 1e3:.2f}ms  p99 {lag['p99_us'] / 1e3:.2f}ms  max {lag['max_us'] / 1e3:.2f}ms")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"config": vars(args), "result": result}, f, ensure_ascii=False, indent=4)
+        print(f"压测结果已保存至 {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
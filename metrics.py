@@ -0,0 +1,156 @@
+import os
+import threading
+from bisect import bisect_left
+
+# 是否采集指标，未开启时各埋点只做一次布尔判断
+enabled = os.environ.get("TEMPLATE_METRICS", "0").lower() not in ("", "0", "false", "no")
+
+# 默认延迟分桶（秒）
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_metrics = []
+
+
+def _format_labels(labelnames, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        单调递增的计数器
+
+        Args:
+            name: 指标名称
+            documentation: 指标说明
+            labelnames: 标签名称
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        分桶统计的直方图
+
+        Args:
+            name: 指标名称
+            documentation: 指标说明
+            labelnames: 标签名称
+            buckets: 分桶上限，升序
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, amount, *labelvalues):
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                # [各分桶计数..., 总和, 总次数]
+                state = self._values[labelvalues] = [0] * (len(self.buckets) + 2)
+            index = bisect_left(self.buckets, amount)
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += amount
+            state[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labelvalues, list(state)) for labelvalues, state in self._values.items())
+        for labelvalues, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                labels = _format_labels(self.labelnames, labelvalues, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {state[-1]}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(float(state[-2]))}")
+            lines.append(f"{self.name}_count{labels} {state[-1]}")
+        return lines
+
+
+class CallbackGauge:
+    def __init__(self, name, documentation, callback, metric_type="gauge"):
+        """
+        渲染时才取值的指标，用于导出缓存命中次数等已有统计
+
+        Args:
+            name: 指标名称
+            documentation: 指标说明
+            callback: 返回当前值的函数，返回None时不输出
+            metric_type: 指标类型，gauge或counter
+        """
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.metric_type = metric_type
+        _metrics.append(self)
+
+    def render(self):
+        value = self.callback()
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}",
+                f"{self.name} {_format_value(value)}"]
+
+
+def render():
+    """
+    以Prometheus文本格式输出全部指标
+
+    Returns:
+        str: 文本格式的指标
+    """
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# 模板解析各阶段耗时：load（检查模板文件变化及热加载，包括后台定时检查）、cache（结果缓存查找）、match（模板匹配）、render（变量替换）、serialize（构建响应）
+STAGE_SECONDS = Histogram("template_stage_duration_seconds", "模板解析各阶段耗时", ["stage"])
+REQUEST_SECONDS = Histogram("template_request_duration_seconds", "接口请求耗时", ["method", "path", "status"])
+MATCHES = Counter("template_matches_total", "按模板名称统计的匹配次数", ["template"])
+NO_MATCHES = Counter("template_no_match_total", "未找到匹配模板的次数")
+ERRORS = Counter("template_errors_total", "模板解析失败次数", ["endpoint"])
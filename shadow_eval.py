@@ -0,0 +1,273 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+from collections import Counter
+
+from template_parser import TemplateRegistry
+
+# 后台任务每次提交到线程中评估的最大请求数
+EVAL_BATCH = 64
+
+
+def _evaluate(parser, user_data):
+    """
+    解析请求，不记录监控指标，避免影子评估混入线上统计
+
+    Returns:
+        tuple: (模板名称, 填充后的内容, 耗时纳秒)
+    """
+    start = time.perf_counter_ns()
+    result = parser.find_best_template(user_data, record_metrics=False)
+    elapsed = time.perf_counter_ns() - start
+    return (result["template"].get("name") if result["template"] is not None else None), result["content"], elapsed
+
+
+class ShadowEvaluator:
+    def __init__(self, candidate_file_path, log_file_path, queue_size=1000, sample_rate=1.0):
+        """
+        影子评估：在后台用候选模板文件重新解析线上请求，与当前模板的结果比较，
+        将决策差异和两侧耗时逐行写入本地日志，不影响线上响应
+
+        Args:
+            candidate_file_path: 候选模板文件路径
+            log_file_path: 评估日志路径（NDJSON，追加写入）
+            queue_size: 待评估请求队列上限，队列已满时丢弃新请求
+            sample_rate: 参与评估的请求比例
+        """
+        self.candidate = TemplateRegistry(candidate_file_path)
+        self.log_file_path = log_file_path
+        self.queue_size = queue_size
+        self.sample_rate = sample_rate
+        self.submitted = 0
+        self.dropped = 0
+        self.evaluated = 0
+        self.differences = 0
+        self.errors = 0
+        self._queue = None
+        self._task = None
+        self._log = None
+        # 日志在评估线程中写入，关闭时需等待正在进行的写入完成
+        self._log_lock = threading.Lock()
+
+    def start(self):
+        """
+        打开日志并启动后台评估任务，需在事件循环中调用
+        """
+        self._log = open(self.log_file_path, 'a', encoding='utf-8')
+        self._queue = asyncio.Queue(self.queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        停止后台评估任务并关闭日志，队列中尚未评估的请求直接丢弃
+        """
+        queue, self._queue = self._queue, None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if queue is not None:
+            self.dropped += queue.qsize()
+        with self._log_lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    def submit(self, user_data, snapshot):
+        """
+        提交一条已解析的请求，只做入队，不等待评估
+
+        Args:
+            user_data: 用户数据
+            snapshot: 线上解析该请求使用的模板快照
+
+        Returns:
+            bool: 是否已入队
+        """
+        queue = self._queue
+        if queue is None:
+            return False
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        try:
+            queue.put_nowait((user_data, snapshot))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    async def _run(self):
+        queue = self._queue
+        while True:
+            items = [await queue.get()]
+            while len(items) < EVAL_BATCH and not queue.empty():
+                items.append(queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._evaluate_batch, items)
+            except Exception as e:
+                self.errors += len(items)
+                print(f"影子评估失败: {e}")
+
+    def compare(self, user_data, active_snapshot, candidate_snapshot, candidate_first=False):
+        """
+        分别用当前模板和候选模板解析同一请求并比较结果
+
+        Args:
+            user_data: 用户数据
+            active_snapshot: 当前模板快照
+            candidate_snapshot: 候选模板快照
+            candidate_first: 是否先解析候选模板，交替先后顺序以抵消CPU缓存对耗时的影响
+
+        Returns:
+            dict: 评估记录，结果不一致时附带请求数据
+        """
+        if candidate_first:
+            candidate = _evaluate(candidate_snapshot.parser, user_data)
+            active = _evaluate(active_snapshot.parser, user_data)
+        else:
+            active = _evaluate(active_snapshot.parser, user_data)
+            candidate = _evaluate(candidate_snapshot.parser, user_data)
+        record = {
+            "time": time.time(),
+            "active_digest": active_snapshot.digest,
+            "candidate_digest": candidate_snapshot.digest,
+            "active_template": active[0],
+            "candidate_template": candidate[0],
+            "same_template": active[0] == candidate[0],
+            "same_content": active[1] == candidate[1],
+            "active_ns": active[2],
+            "candidate_ns": candidate[2]
+        }
+        if not (record["same_template"] and record["same_content"]):
+            record["user_data"] = user_data
+            record["active_content"] = active[1]
+            record["candidate_content"] = candidate[1]
+        return record
+
+    def _evaluate_batch(self, items):
+        candidate_snapshot = self.candidate.current_snapshot()
+        lines = []
+        for user_data, active_snapshot in items:
+            try:
+                record = self.compare(user_data, active_snapshot, candidate_snapshot, self.evaluated % 2 == 1)
+            except Exception as e:
+                self.errors += 1
+                print(f"影子评估失败: {e}")
+                continue
+            self.evaluated += 1
+            if "user_data" in record:
+                self.differences += 1
+            lines.append(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        with self._log_lock:
+            if self._log is not None:
+                self._log.write("".join(lines))
+                self._log.flush()
+
+    def stats(self):
+        """
+        获取影子评估的统计信息
+
+        Returns:
+            dict: 候选模板、队列及评估计数
+        """
+        snapshot = self.candidate.current_snapshot()
+        return {
+            "candidate_file": self.candidate.template_file_path,
+            "candidate_templates": len(snapshot.parser.templates),
+            "candidate_digest": snapshot.digest,
+            "log_file": self.log_file_path,
+            "sample_rate": self.sample_rate,
+            "queue_size": self.queue_size,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "evaluated": self.evaluated,
+            "differences": self.differences,
+            "errors": self.errors
+        }
+
+
+def summarize_log(log_file_path, top=20):
+    """
+    汇总影子评估日志
+
+    Args:
+        log_file_path: 评估日志路径
+        top: 输出变化最多的模板决策数
+
+    Returns:
+        dict: 差异统计、变化最多的决策（当前模板 -> 候选模板）及两侧耗时百分位
+    """
+    from benchmark import summarize
+
+    count = 0
+    template_changes = 0
+    content_changes = 0
+    decisions = Counter()
+    active_ns = []
+    candidate_ns = []
+    with open(log_file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            count += 1
+            active_ns.append(record["active_ns"])
+            candidate_ns.append(record["candidate_ns"])
+            if not record["same_template"]:
+                template_changes += 1
+                decisions[(record["active_template"], record["candidate_template"])] += 1
+            elif not record["same_content"]:
+                content_changes += 1
+    return {
+        "count": count,
+        "template_changes": template_changes,
+        "content_changes": content_changes,
+        "change_rate": (template_changes + content_changes) / count if count else 0.0,
+        "top_changes": [{"active": active, "candidate": candidate, "count": n}
+                        for (active, candidate), n in decisions.most_common(top)],
+        "active": summarize("当前模板", active_ns),
+        "candidate": summarize("候选模板", candidate_ns)
+    }
+
+
+def main():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="汇总影子评估日志：候选模板与当前模板的决策差异及耗时对比")
+    parser.add_argument("--log", default=os.path.join(current_dir, "shadow_eval.ndjson"), help="评估日志路径")
+    parser.add_argument("--top", type=int, default=20, help="输出变化最多的模板决策数")
+    parser.add_argument("--output", help="汇总结果JSON文件路径")
+    args = parser.parse_args()
+
+    try:
+        report = summarize_log(args.log, args.top)
+    except Exception as e:
+        print(f"加载评估日志失败: {e}")
+        return 1
+
+    print(f"共评估 {report['count']} 条请求，模板变化 {report['template_changes']} 条，"
+          f"内容变化 {report['content_changes']} 条（{report['change_rate']:.2%}）")
+    for item in report["top_changes"]:
+        print(f"  {item['active']} -> {item['candidate']}: {item['count']}")
+    for side in ("active", "candidate"):
+        result = report[side]
+        print(f"{result['name']}  p50 {result['p50_us']:.1f}us  p90 {result['p90_us']:.1f}us  "
+              f"p99 {result['p99_us']:.1f}us  max {result['max_us']:.1f}us")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+        print(f"汇总结果已保存至 {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,326 @@
+import os
+import sys
+import json
+import argparse
+from itertools import product
+from collections.abc import Hashable
+
+from template_parser import TemplateParser, SLOT_SIDES, SLOT_FALLBACK
+
+# 通配符，表示该侧领域或意图匹配任意有效值
+WILDCARD = "*"
+
+
+class _SideInfo:
+    __slots__ = ("domains", "intents", "masks", "exact_values", "required", "conflict")
+
+    def __init__(self, condition, masks):
+        """
+        模板某一侧条件的分析用信息
+
+        Args:
+            condition: 模板中该侧的条件
+            masks: 解析器编译的槽位掩码
+        """
+        self.domains = self._values(condition.get("domain", []))
+        self.intents = self._values(condition.get("intent", []))
+        self.masks = masks
+        self.exact_values = {}
+        self.required = set()
+        self.conflict = None
+        if masks is SLOT_FALLBACK:
+            return
+        for slot_dict in condition.get("slots", []):
+            slot_key = next(iter(slot_dict))
+            slot_value = slot_dict[slot_key]
+            self.required.add(slot_key)
+            if slot_value == "*":
+                continue
+            if slot_key in self.exact_values and self.exact_values[slot_key] != slot_value:
+                self.conflict = slot_key
+            self.exact_values.setdefault(slot_key, slot_value)
+
+    @staticmethod
+    def _values(values):
+        # 与TemplateParser._condition_keys一致：空值和不可哈希的值永远无法匹配
+        if WILDCARD in values:
+            return WILDCARD
+        return {value for value in values if value and isinstance(value, Hashable)}
+
+
+def _set_covers(outer, inner):
+    return outer == WILDCARD or (inner != WILDCARD and inner <= outer)
+
+
+def _set_overlaps(first, second):
+    return first == WILDCARD or second == WILDCARD or not first.isdisjoint(second)
+
+
+def _side_lookup_keys(side_key):
+    """
+    某侧领域意图为side_key的请求还会命中的索引键，与TemplateParser._lookup_keys一致
+    """
+    if side_key is None:
+        return [None]
+    domain, intent = side_key
+    return list(dict.fromkeys([(domain, intent), (domain, WILDCARD), (WILDCARD, intent), (WILDCARD, WILDCARD), None]))
+
+
+class TemplateAnalyzer:
+    def __init__(self, templates):
+        """
+        基于解析器编译后的匹配索引对模板库做静态分析
+
+        Args:
+            templates: 模板列表
+        """
+        self.templates = templates
+        self.parser = TemplateParser(templates=templates)
+        ordered = self.parser.ordered_templates()
+        # 排序后序号 -> 模板文件中的序号
+        positions = {id(template): position for position, template in enumerate(templates)}
+        self._positions = [positions[id(template)] for template in ordered]
+        self._priorities = self.parser.priorities()
+        self._sides = []
+        for template, template_masks in zip(ordered, self.parser.slot_masks()):
+            conditions = template.get("conditions", {})
+            sides = []
+            for side, masks in zip(SLOT_SIDES, template_masks):
+                if masks is None:
+                    sides.append(None)
+                elif not isinstance(conditions[side], dict):
+                    sides.append(_SideInfo({}, SLOT_FALLBACK))
+                else:
+                    sides.append(_SideInfo(conditions[side], masks))
+            self._sides.append(sides)
+        self._keys = self.parser.index_keys()
+        self._ordered = ordered
+
+    def _describe(self, order):
+        template = self._ordered[order]
+        return {"name": template.get("name"), "position": self._positions[order] + 1,
+                "priority": self._priorities[order]}
+
+    def _impossible_reason(self, order):
+        """
+        模板自身条件是否不可能被满足
+
+        Returns:
+            str: 原因，可以满足时返回None
+        """
+        for side, info in zip(SLOT_SIDES, self._sides[order]):
+            if info is None:
+                continue
+            if not info.domains:
+                return f"{side}没有有效的领域"
+            if not info.intents:
+                return f"{side}没有有效的意图"
+            if info.conflict is not None:
+                return f"{side}对槽位{info.conflict}要求了不同的精确值"
+        return None
+
+    def _covers(self, first, second):
+        """
+        判断模板first是否匹配所有能匹配模板second的请求
+        """
+        for first_info, second_info in zip(self._sides[first], self._sides[second]):
+            if first_info is None:
+                continue
+            if second_info is None:
+                return False
+            if not _set_covers(first_info.domains, second_info.domains):
+                return False
+            if not _set_covers(first_info.intents, second_info.intents):
+                return False
+            if first_info.masks is SLOT_FALLBACK or second_info.masks is SLOT_FALLBACK:
+                return False
+            if first_info.masks[0] & ~second_info.masks[0] or first_info.masks[1] & ~second_info.masks[1]:
+                return False
+        return True
+
+    def _overlaps(self, first, second):
+        """
+        判断是否存在同时匹配两个模板的请求
+        """
+        for first_info, second_info in zip(self._sides[first], self._sides[second]):
+            if first_info is None or second_info is None:
+                continue
+            if not _set_overlaps(first_info.domains, second_info.domains):
+                return False
+            if not _set_overlaps(first_info.intents, second_info.intents):
+                return False
+            for slot_key, slot_value in first_info.exact_values.items():
+                if slot_key in second_info.exact_values and second_info.exact_values[slot_key] != slot_value:
+                    return False
+        return True
+
+    def _representative_request(self, order):
+        """
+        构造恰好满足该模板条件的最小请求范围：取一个领域和意图，只带模板要求的槽位，
+        精确值取模板要求的值，通配槽位不取任何模板要求的精确值；能匹配该范围的模板才可能覆盖该模板
+        """
+        request = {}
+        for side, info in zip(SLOT_SIDES, self._sides[order]):
+            if info is None:
+                # 没有该侧条件时，只有同样没有该侧条件的模板能覆盖它
+                request[side] = {"domain": "", "intent": ""}
+                continue
+            # 通配符用一个不会出现在模板中的值代替，只会取到同样带通配符的候选模板
+            domain = next(iter(info.domains)) if info.domains != WILDCARD else object()
+            intent = next(iter(info.intents)) if info.intents != WILDCARD else object()
+            slots = {slot_key: set() for slot_key in info.required}
+            for slot_key, slot_value in info.exact_values.items():
+                slots[slot_key] = {slot_value}
+            request[side] = {"domain": domain, "intent": intent, "slots": slots}
+        return request
+
+    def unreachable(self):
+        """
+        查找永远不会被选中的模板：自身条件无法满足，或能匹配它的请求都会先匹配到更靠前的模板
+
+        Returns:
+            list: 不可达模板及原因
+        """
+        results = []
+        impossible = [self._impossible_reason(order) for order in range(len(self._ordered))]
+        for order, reason in enumerate(impossible):
+            if reason is not None:
+                results.append(dict(self._describe(order), reason=reason, shadowed_by=None))
+                continue
+            request = self._representative_request(order)
+            for candidate in self.parser.matching_orders(request["origin_slot"], request["last_slot"]):
+                if candidate >= order:
+                    break
+                if impossible[candidate] is None and self._covers(candidate, order):
+                    results.append(dict(self._describe(order), reason="被更靠前的模板完全覆盖",
+                                        shadowed_by=self._describe(candidate)))
+                    break
+        return results
+
+    def ties(self, unreachable_orders=()):
+        """
+        按索引桶和优先级分组查找同优先级冲突：组内排在最前的模板会被选中，与其可能同时匹配同一请求的同组模板
+        按模板文件中的顺序落选，结果不直观。组内模板只与选中的模板比较，请求命中该桶时同时命中的
+        带通配符或缺少某侧条件的桶也只比较各组选中的模板，总工作量与索引大小成线性关系
+
+        Args:
+            unreachable_orders: 已判定不可达的模板序号，不参与分组
+
+        Returns:
+            list: 冲突组，包含优先级、被选中的模板及与其冲突而落选的模板
+        """
+        unreachable_orders = set(unreachable_orders)
+        # (索引键, 优先级) -> 按匹配顺序排列的模板序号
+        groups = {}
+        for order, keys in enumerate(self._keys):
+            if order in unreachable_orders:
+                continue
+            for key in keys:
+                groups.setdefault((key, self._priorities[order]), []).append(order)
+
+        shadowed = {}
+        for (key, priority), orders in groups.items():
+            winner = orders[0]
+            for order in orders[1:]:
+                if self._overlaps(winner, order):
+                    shadowed.setdefault(winner, set()).add(order)
+            for other_key in product(*(_side_lookup_keys(side_key) for side_key in key)):
+                other = groups.get((other_key, priority))
+                if other is None or other[0] == winner:
+                    continue
+                first, second = min(winner, other[0]), max(winner, other[0])
+                if self._overlaps(first, second):
+                    shadowed.setdefault(first, set()).add(second)
+
+        return [{"priority": self._priorities[winner], "winner": self._describe(winner),
+                 "shadowed": [self._describe(order) for order in sorted(orders)]}
+                for winner, orders in sorted(shadowed.items())]
+
+    def placeholders(self):
+        """
+        查找引用了匹配条件不保证存在的槽位的变量，请求缺少该槽位时会渲染为"未知"
+
+        Returns:
+            list: 变量及原因
+        """
+        results = []
+        for order, paths in enumerate(self.parser.render_paths()):
+            for path in paths:
+                if len(path) < 3 or path[0] not in SLOT_SIDES or path[1] != "slots":
+                    continue
+                info = self._sides[order][SLOT_SIDES.index(path[0])]
+                if info is None:
+                    reason = f"模板没有{path[0]}条件"
+                elif info.masks is SLOT_FALLBACK or path[2] in info.required:
+                    continue
+                else:
+                    reason = f"{path[0]}的槽位条件中没有{path[2]}"
+                results.append(dict(self._describe(order), variable="{{" + ".".join(path) + "}}", reason=reason))
+        return results
+
+    def analyze(self):
+        """
+        执行全部分析
+
+        Returns:
+            dict: unreachable、ties、placeholders三类问题
+        """
+        unreachable = self.unreachable()
+        order_of = {position: order for order, position in enumerate(self._positions)}
+        orders = {order_of[item["position"] - 1] for item in unreachable}
+        return {
+            "templates": len(self.templates),
+            "unreachable": unreachable,
+            "ties": self.ties(orders),
+            "placeholders": self.placeholders()
+        }
+
+
+def _label(item):
+    return f"{item['name']}（第{item['position']}个，优先级{item['priority']}）"
+
+
+def print_report(report):
+    print(f"共 {report['templates']} 个模板")
+    print(f"不可达模板 {len(report['unreachable'])} 个：")
+    for item in report["unreachable"]:
+        text = f"  {_label(item)}: {item['reason']}"
+        if item["shadowed_by"]:
+            text += f" -> {_label(item['shadowed_by'])}"
+        print(text)
+    print(f"同优先级冲突 {len(report['ties'])} 组：")
+    for item in report["ties"]:
+        print(f"  {_label(item['winner'])} 优先于 {'、'.join(_label(shadowed) for shadowed in item['shadowed'])}")
+    print(f"变量引用不保证存在的槽位 {len(report['placeholders'])} 处：")
+    for item in report["placeholders"]:
+        print(f"  {_label(item)} {item['variable']}: {item['reason']}")
+
+
+def main():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="模板库静态分析：不可达模板、同优先级冲突、变量引用检查")
+    parser.add_argument("--templates", default=os.path.join(current_dir, "template.json"), help="模板文件路径")
+    parser.add_argument("--output", help="分析结果JSON文件路径")
+    parser.add_argument("--strict", action="store_true", help="存在不可达模板或同优先级冲突时返回非0")
+    args = parser.parse_args()
+
+    try:
+        with open(args.templates, 'r', encoding='utf-8') as f:
+            templates = json.load(f)
+    except Exception as e:
+        print(f"加载模板文件失败: {e}")
+        return 1
+
+    report = TemplateAnalyzer(templates).analyze()
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+        print(f"分析结果已保存至 {args.output}")
+    if args.strict and (report["unreachable"] or report["ties"]):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,49 @@
 import json
 import re
 import os
+import hashlib
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from itertools import product
+
+import metrics
+from template_snapshot import SNAPSHOT_SUFFIX, SnapshotReader
+
+# 模板中{{}}格式的变量
+VARIABLE_PATTERN = re.compile(r'\{\{([^\}]+)\}\}')
+
+# 结果缓存默认配置，容量为0时不启用缓存
+DEFAULT_CACHE_SIZE = int(os.environ.get("TEMPLATE_CACHE_SIZE", "0"))
+DEFAULT_CACHE_TTL = float(os.environ.get("TEMPLATE_CACHE_TTL", "0")) or None
+
+# 多模板集配置：模板集目录、最多同时加载的模板集数、已加载模板集的模板总数上限（0为不限）、空闲淘汰时间（秒）
+DEFAULT_SETS_MAX = int(os.environ.get("TEMPLATE_SETS_MAX", "16"))
+DEFAULT_SETS_MAX_TEMPLATES = int(os.environ.get("TEMPLATE_SETS_MAX_TEMPLATES", "0"))
+DEFAULT_SETS_IDLE_TTL = float(os.environ.get("TEMPLATE_SETS_IDLE_TTL", "0")) or None
+
+# 模板集名称只允许字母、数字、下划线、连字符和中文，避免请求中的名称访问目录外的文件
+NAMESPACE_PATTERN = re.compile(r'^[\w\-]+$')
+
+# 参与匹配的两侧槽位
+SLOT_SIDES = ("origin_slot", "last_slot")
+# 槽位要求无法编译为位掩码时的标记，匹配时退回逐条比较
+SLOT_FALLBACK = object()
 
 class TemplateParser:
-    def __init__(self, template_file_path):
+    def __init__(self, template_file_path=None, templates=None):
         """
         初始化模板解析器
         
         Args:
             template_file_path: 模板文件路径
+            templates: 已加载的模板列表，传入时不再读取模板文件
         """
         self.template_file_path = template_file_path
-        self.templates = self._load_templates()
+        self.templates = templates if templates is not None else self._load_templates()
+        self._compile_index()
     
     def _load_templates(self):
         """
@@ -21,6 +53,13 @@ class TemplateParser:
             list: 模板列表
         """
         try:
+            # 支持直接加载template_snapshot编译出的二进制快照
+            if self.template_file_path.endswith(SNAPSHOT_SUFFIX):
+                reader = SnapshotReader(self.template_file_path)
+                try:
+                    return reader.load()
+                finally:
+                    reader.close()
             with open(self.template_file_path, 'r', encoding='utf-8') as f:
                 templates = json.load(f)
             return templates
@@ -28,6 +67,197 @@ class TemplateParser:
             print(f"加载模板文件失败: {e}")
             return []
     
+    @staticmethod
+    def _template_priority(template):
+        """
+        获取模板优先级（数字越小优先级越高）
+        
+        Args:
+            template: 模板
+            
+        Returns:
+            int: 优先级，无法解析时按99处理
+        """
+        try:
+            return int(template.get("priority", 99))
+        except (TypeError, ValueError):
+            print(f"模板 {template.get('name')} 的优先级无效: {template.get('priority')}，按99处理")
+            return 99
+    
+    @staticmethod
+    def _condition_keys(conditions, side):
+        """
+        计算模板某一侧条件在索引中的(domain, intent)键
+        
+        Args:
+            conditions: 模板中的条件
+            side: origin_slot 或 last_slot
+            
+        Returns:
+            list: 索引键列表，None表示该侧没有条件
+        """
+        if side not in conditions:
+            return [None]
+        condition = conditions[side]
+        keys = []
+        for values_name in ("domain", "intent"):
+            values = condition.get(values_name, [])
+            if "*" in values:
+                keys.append(["*"])
+            else:
+                # 空值永远无法匹配，不进入索引
+                keys.append(list(dict.fromkeys(v for v in values if v and isinstance(v, Hashable))))
+        return list(product(*keys))
+    
+    @staticmethod
+    def _lookup_keys(user_slot):
+        """
+        计算用户某一侧槽位需要查找的索引键
+        
+        Args:
+            user_slot: 用户对象中的origin_slot或last_slot
+            
+        Returns:
+            list: 索引键列表
+        """
+        domain = user_slot.get("domain", "")
+        intent = user_slot.get("intent", "")
+        if not domain or not intent:
+            # 领域或意图为空时只有未设置该侧条件的模板可能匹配
+            return [None]
+        return [(domain, intent), (domain, "*"), ("*", intent), ("*", "*"), None]
+    
+    def _compile_index(self):
+        """
+        按优先级排序模板，并按origin/last两侧的(domain, intent)分桶建立索引
+        """
+        # 稳定排序，同优先级保持模板文件中的顺序
+        self._ordered = sorted(self.templates, key=self._template_priority)
+        self._render_plans = [self._compile_content(template.get("content", "")) for template in self._ordered]
+        # 匹配只读取origin_slot和last_slot，渲染还会读取模板变量引用的顶层字段
+        self._cache_fields = sorted({"origin_slot", "last_slot"} |
+                                    {path[0] for _, paths in self._render_plans for path in paths})
+        self._index = {}
+        for order, template in enumerate(self._ordered):
+            conditions = template.get("conditions", {})
+            for key in product(self._condition_keys(conditions, "origin_slot"),
+                               self._condition_keys(conditions, "last_slot")):
+                self._index.setdefault(key, []).append(order)
+        self._compile_slot_masks()
+    
+    def _compile_slot_masks(self):
+        """
+        将各模板两侧的槽位要求编译为位掩码：
+        每个槽位名称对应一位（必需槽位），每个非通配的(槽位名称, 值)对应一位（精确值），
+        匹配时只需遍历一次用户槽位得到用户掩码，再对每个候选模板做两次位运算
+        """
+        self._slot_key_bits = {side: {} for side in SLOT_SIDES}
+        self._slot_value_bits = {side: {} for side in SLOT_SIDES}
+        self._slot_masks = []
+        for template in self._ordered:
+            conditions = template.get("conditions", {})
+            self._slot_masks.append(tuple(self._compile_side_slots(conditions, side) for side in SLOT_SIDES))
+    
+    def _compile_side_slots(self, conditions, side):
+        """
+        编译模板某一侧的槽位要求
+        
+        Args:
+            conditions: 模板中的条件
+            side: origin_slot 或 last_slot
+            
+        Returns:
+            tuple: (必需槽位掩码, 精确值掩码)；该侧没有条件时返回None，无法编译时返回SLOT_FALLBACK
+        """
+        if side not in conditions:
+            return None
+        condition = conditions[side]
+        if not isinstance(condition, dict):
+            return SLOT_FALLBACK
+        template_slots = condition.get("slots", [])
+        if not template_slots:
+            return 0, 0
+        
+        key_bits = self._slot_key_bits[side]
+        value_bits = self._slot_value_bits[side]
+        required = exact = 0
+        try:
+            for slot_dict in template_slots:
+                if not isinstance(slot_dict, dict) or not slot_dict:
+                    return SLOT_FALLBACK
+                # 与_match_slots一致，只取第一个键
+                slot_key = next(iter(slot_dict))
+                slot_value = slot_dict[slot_key]
+                required |= key_bits.setdefault(slot_key, 1 << len(key_bits))
+                if slot_value != "*":
+                    if slot_value != slot_value:
+                        # NaN等不等于自身的值无法用哈希查找
+                        return SLOT_FALLBACK
+                    exact |= value_bits.setdefault((slot_key, slot_value), 1 << len(value_bits))
+        except TypeError:
+            # 槽位名称或值不可哈希
+            return SLOT_FALLBACK
+        return required, exact
+    
+    def _user_slot_masks(self, side, user_slot):
+        """
+        遍历一次用户槽位，计算其在某一侧的槽位掩码
+        
+        Args:
+            side: origin_slot 或 last_slot
+            user_slot: 用户对象中的origin_slot或last_slot
+            
+        Returns:
+            tuple: (已有槽位掩码, 精确值命中掩码)，用户槽位不是字典时返回None
+        """
+        user_slots = user_slot.get("slots", {})
+        if not user_slots:
+            return 0, 0
+        if not isinstance(user_slots, dict):
+            return None
+        
+        key_bits = self._slot_key_bits[side]
+        value_bits = self._slot_value_bits[side]
+        present = matched = 0
+        for slot_key, slot_value in user_slots.items():
+            bit = key_bits.get(slot_key)
+            if bit is None:
+                # 没有模板要求该槽位
+                continue
+            present |= bit
+            try:
+                matched |= value_bits.get((slot_key, slot_value), 0)
+            except TypeError:
+                # 不可哈希的值不会等于任何可编译的精确值
+                pass
+        return present, matched
+    
+    def _iter_candidates(self, user_data):
+        """
+        按优先级顺序产出可能匹配的候选模板序号
+        
+        Args:
+            user_data: 用户数据
+            
+        Returns:
+            iterable: 候选模板在排序后模板列表中的序号，候选模板的领域和意图均已匹配；无法走索引时返回None
+        """
+        # 用户数据缺少某一侧时该侧条件不参与匹配，退化为顺序遍历
+        if "origin_slot" not in user_data or "last_slot" not in user_data:
+            return None
+        
+        try:
+            buckets = [self._index[key] for key in product(self._lookup_keys(user_data["origin_slot"]),
+                                                           self._lookup_keys(user_data["last_slot"]))
+                       if key in self._index]
+        except TypeError:
+            # 领域或意图不可哈希，无法走索引
+            return None
+        
+        if not buckets:
+            return ()
+        return buckets[0] if len(buckets) == 1 else heapq.merge(*buckets)
+    
     def _match_domain(self, template_domains, user_domain):
         """
         匹配领域
@@ -146,40 +376,98 @@ class TemplateParser:
         
         return True
     
-    def _replace_variables(self, content, user_data):
+    @staticmethod
+    def _compile_content(content):
         """
-        替换模板中的变量
+        将模板内容编译为渲染计划
         
         Args:
             content: 模板内容
+            
+        Returns:
+            tuple: (文本片段列表, 变量路径列表)，文本片段比变量路径多一个，两者交替拼接
+        """
+        if not isinstance(content, str):
+            content = ""
+        segments = VARIABLE_PATTERN.split(content)
+        literals = segments[0::2]
+        # 变量路径预先拆分，如 origin_slot.slots.query_count -> ("origin_slot", "slots", "query_count")
+        paths = [tuple(match.strip().split('.')) for match in segments[1::2]]
+        return literals, paths
+    
+    @staticmethod
+    def _render(plan, user_data):
+        """
+        按渲染计划填充变量
+        
+        Args:
+            plan: _compile_content生成的渲染计划
             user_data: 用户数据
             
         Returns:
             str: 替换后的内容
         """
-        # 使用正则表达式查找所有{{}}格式的变量
-        pattern = r'\{\{([^\}]+)\}\}'
-        matches = re.findall(pattern, content)
+        literals, paths = plan
+        if not paths:
+            return literals[0]
         
-        # 替换每个变量
-        for match in matches:
-            var_path = match.strip()  # 变量路径，如 origin_slot.slots.query_count
-            parts = var_path.split('.')
-            
+        pieces = [literals[0]]
+        for path, literal in zip(paths, literals[1:]):
             # 获取变量值
             value = user_data
             try:
-                for part in parts:
+                for part in path:
                     value = value[part]
             except (KeyError, TypeError):
                 value = "未知"  # 如果变量不存在，则替换为"未知"
+            pieces.append(str(value))
+            pieces.append(literal)
+        return "".join(pieces)
+    
+    def render(self, order, user_data):
+        """
+        按预编译的渲染计划填充模板内容，与find_best_template的渲染路径一致
+        
+        Args:
+            order: 模板在优先级顺序中的序号
+            user_data: 用户数据
+            
+        Returns:
+            str: 替换后的内容
+        """
+        return self._render(self._render_plans[order], user_data)
+    
+    def _replace_variables(self, content, user_data):
+        """
+        替换模板中的变量
+        
+        Args:
+            content: 模板内容
+            user_data: 用户数据
             
-            # 替换变量
-            content = content.replace(f"{{{{{match}}}}}", str(value))
+        Returns:
+            str: 替换后的内容
+        """
+        return self._render(self._compile_content(content), user_data)
+    
+    def cache_key(self, user_data):
+        """
+        计算用户数据的缓存键，只包含匹配和渲染会读取的字段
         
-        return content
+        Args:
+            user_data: 用户数据
+            
+        Returns:
+            str: 规范化字段的哈希值，字段无法规范化时返回None
+        """
+        fields = {field: user_data[field] for field in self._cache_fields if field in user_data}
+        try:
+            canonical = json.dumps(fields, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=repr)
+        except (TypeError, ValueError):
+            return None
+        return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
     
-    def find_best_template(self, user_data):
+    def _match(self, user_data):
         """
         查找最佳匹配的模板
         
@@ -187,51 +475,708 @@ class TemplateParser:
             user_data: 用户数据
             
         Returns:
-            dict: 最佳匹配的模板和填充后的内容
+            int: 最佳模板在排序后模板列表中的序号，未匹配时返回None
+        """
+        candidates = self._iter_candidates(user_data)
+        if candidates is None:
+            for order, template in enumerate(self._ordered):
+                if self._match_conditions(template.get("conditions", {}), user_data):
+                    return order
+            return None
+        
+        # 候选模板已按优先级排序且领域、意图均已匹配，只需检查槽位，第一个满足的即为最佳模板
+        user_masks = [self._user_slot_masks(side, user_data[side]) for side in SLOT_SIDES]
+        for order in candidates:
+            for side, template_mask, user_mask in zip(SLOT_SIDES, self._slot_masks[order], user_masks):
+                if template_mask is None:
+                    continue
+                if template_mask is SLOT_FALLBACK or user_mask is None:
+                    template_slots = self._ordered[order]["conditions"][side].get("slots", [])
+                    if not self._match_slots(template_slots, user_data[side].get("slots", {})):
+                        break
+                elif template_mask[0] & ~user_mask[0] or template_mask[1] & ~user_mask[1]:
+                    # 缺少必需槽位，或精确值不一致
+                    break
+            else:
+                return order
+        return None
+    
+    def _slot_set_masks(self, side, slot_values):
+        """
+        计算槽位取值范围在某一侧的槽位掩码，与_user_slot_masks相同，但每个槽位可以有多个可选取值
+        
+        Args:
+            side: origin_slot 或 last_slot
+            slot_values: 槽位名称 -> 可选取值集合
+            
+        Returns:
+            tuple: (已有槽位掩码, 精确值命中掩码)
+        """
+        key_bits = self._slot_key_bits[side]
+        value_bits = self._slot_value_bits[side]
+        present = matched = 0
+        for slot_key, values in slot_values.items():
+            bit = key_bits.get(slot_key)
+            if bit is None:
+                continue
+            present |= bit
+            for value in values:
+                try:
+                    matched |= value_bits.get((slot_key, value), 0)
+                except TypeError:
+                    pass
+        return present, matched
+    
+    def _slots_satisfiable(self, template_slots, slot_values):
+        """
+        与_match_slots规则一致，模板要求的精确值只要在可选取值中即视为可满足
+        """
+        if not template_slots:
+            return True
+        if not slot_values:
+            return False
+        try:
+            for slot_dict in template_slots:
+                slot_key = list(slot_dict.keys())[0]
+                if slot_key not in slot_values:
+                    return False
+                if slot_dict[slot_key] != "*" and slot_dict[slot_key] not in slot_values[slot_key]:
+                    return False
+        except (AttributeError, IndexError, TypeError):
+            # 格式错误的槽位条件在线上匹配时会出错，视为无法满足
+            return False
+        return True
+    
+    def matching_orders(self, origin_slot, last_slot=None):
+        """
+        查找可能匹配某类请求的模板，供覆盖统计、静态分析等离线工具使用，与_match使用相同的索引和槽位掩码
+        
+        Args:
+            origin_slot: 请求origin_slot的取值范围 {"domain": 领域, "intent": 意图, "slots": {槽位名称: 可选取值集合}}
+            last_slot: 请求last_slot的取值范围，默认与origin_slot相同
+            
+        Returns:
+            generator: 按优先级从高到低产出模板在排序后模板列表中的序号；请求带有slots中的全部槽位，
+                       每个槽位的取值为可选取值之一，模板要求的精确值在可选取值中即视为可满足
+        """
+        sides = {"origin_slot": origin_slot, "last_slot": origin_slot if last_slot is None else last_slot}
+        candidates = self._iter_candidates(sides)
+        masks = [self._slot_set_masks(side, sides[side].get("slots", {})) for side in SLOT_SIDES]
+        for order in (candidates if candidates is not None else range(len(self._ordered))):
+            conditions = self._ordered[order].get("conditions", {})
+            for side, template_mask, slot_mask in zip(SLOT_SIDES, self._slot_masks[order], masks):
+                if template_mask is None:
+                    continue
+                condition = conditions[side]
+                if not isinstance(condition, dict):
+                    break
+                if candidates is None and not (
+                        self._match_domain(condition.get("domain", []), sides[side].get("domain", "")) and
+                        self._match_intent(condition.get("intent", []), sides[side].get("intent", ""))):
+                    # 无法走索引时逐个检查领域和意图
+                    break
+                if template_mask is SLOT_FALLBACK:
+                    if not self._slots_satisfiable(condition.get("slots", []), sides[side].get("slots", {})):
+                        break
+                elif template_mask[0] & ~slot_mask[0] or template_mask[1] & ~slot_mask[1]:
+                    break
+            else:
+                yield order
+    
+    def index_keys(self):
         """
-        matched_templates = []
+        获取各模板所在的索引键
         
-        # 遍历所有模板，找出匹配的模板
-        for template in self.templates:
-            if self._match_conditions(template.get("conditions", {}), user_data):
-                matched_templates.append(template)
+        Returns:
+            list: 与排序后模板列表对应，每项为该模板的 (origin侧(领域, 意图), last侧(领域, 意图)) 索引键列表，
+                  某侧没有条件时为None，没有有效领域意图的模板为空列表
+        """
+        keys = [[] for _ in self._ordered]
+        for key, orders in self._index.items():
+            for order in orders:
+                keys[order].append(key)
+        return keys
+    
+    def ordered_templates(self):
+        """
+        获取按匹配优先级排序的模板，序号与matching_orders、index_keys等返回的序号一致
         
-        if not matched_templates:
+        Returns:
+            tuple: 排序后的模板
+        """
+        return tuple(self._ordered)
+    
+    def priorities(self):
+        """
+        获取排序后各模板的优先级
+        
+        Returns:
+            list: 与排序后模板列表对应的优先级（数字越小优先级越高）
+        """
+        return [self._template_priority(template) for template in self._ordered]
+    
+    def slot_masks(self):
+        """
+        获取排序后各模板两侧编译后的槽位要求
+        
+        Returns:
+            tuple: 与排序后模板列表对应，每项为 (origin侧, last侧)，某侧没有条件时为None，
+                   槽位条件无法编译为位掩码时为SLOT_FALLBACK，否则为 (必需槽位掩码, 精确值掩码)
+        """
+        return tuple(self._slot_masks)
+    
+    def render_paths(self):
+        """
+        获取排序后各模板内容引用的变量路径
+        
+        Returns:
+            list: 与排序后模板列表对应，每项为变量路径元组，如 ("origin_slot", "slots", "query_count")
+        """
+        return [tuple(paths) for _, paths in self._render_plans]
+    
+    def find_best_template(self, user_data, record_metrics=True):
+        """
+        查找最佳匹配的模板
+        
+        Args:
+            user_data: 用户数据
+            record_metrics: 是否记录匹配和渲染耗时，影子评估等非线上请求的解析不应计入监控指标
+            
+        Returns:
+            dict: 最佳匹配的模板和填充后的内容
+        """
+        record_metrics = record_metrics and metrics.enabled
+        if record_metrics:
+            start = time.perf_counter()
+            order = self._match(user_data)
+            metrics.STAGE_SECONDS.observe(time.perf_counter() - start, "match")
+        else:
+            order = self._match(user_data)
+        
+        if order is None:
             return {
                 "template": None,
                 "content": "未找到匹配的模板"
             }
         
-        # 按优先级排序（数字越小优先级越高）
-        matched_templates.sort(key=lambda x: int(x.get("priority", 99)))
+        # 按预编译的渲染计划替换模板中的变量
+        if record_metrics:
+            start = time.perf_counter()
+            content = self._render(self._render_plans[order], user_data)
+            metrics.STAGE_SECONDS.observe(time.perf_counter() - start, "render")
+        else:
+            content = self._render(self._render_plans[order], user_data)
         
-        # 获取最佳匹配的模板
-        best_template = matched_templates[0]
+        return {
+            "template": self._ordered[order],
+            "content": content
+        }
+
+class ResultCache:
+    def __init__(self, maxsize, ttl=None):
+        """
+        初始化模板解析结果的LRU缓存
         
-        # 替换模板中的变量
-        content = self._replace_variables(best_template.get("content", ""), user_data)
+        Args:
+            maxsize: 最大缓存条数
+            ttl: 缓存有效期（秒），为None时不过期
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """
+        读取缓存结果
+        
+        Args:
+            key: 缓存键
+            
+        Returns:
+            dict: 缓存的解析结果，未命中时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and entry[1] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, key, result):
+        """
+        写入缓存结果，超出容量时淘汰最久未使用的条目
+        
+        Args:
+            key: 缓存键
+            result: 解析结果
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (result, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """
+        清空缓存条目，命中统计保留
+        """
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        """
+        获取缓存统计信息
+        
+        Returns:
+            dict: 容量、条数及命中/未命中次数
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+class TemplateSnapshot:
+    """
+    模板快照，加载后不再修改，由TemplateRegistry整体替换
+    """
+    __slots__ = ("parser", "mtime_ns", "size", "digest", "loaded_at")
+
+    def __init__(self, parser, mtime_ns=None, size=None, digest=None):
+        self.parser = parser
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.digest = digest
+        self.loaded_at = time.time()
+
+
+class TemplateRegistry:
+    def __init__(self, template_file_path, check_interval=1.0, cache_size=0, cache_ttl=None):
+        """
+        初始化模板注册表，进程内常驻，模板只在文件变化时重新加载
+        
+        Args:
+            template_file_path: 模板文件路径
+            check_interval: 检查模板文件是否变化的最小间隔（秒），为0时每次读取都检查
+            cache_size: 解析结果缓存的最大条数，为0时不启用缓存
+            cache_ttl: 解析结果缓存的有效期（秒），为None时不过期
+        """
+        self.template_file_path = template_file_path
+        self.check_interval = check_interval
+        self.cache = ResultCache(cache_size, cache_ttl) if cache_size > 0 else None
+        self._reload_lock = threading.Lock()
+        self._next_check = 0.0
+        self._snapshot = TemplateSnapshot(TemplateParser(template_file_path, templates=[]))
+        self.reload()
+    
+    def reload(self):
+        """
+        重新读取模板文件，内容有变化时编译并替换当前快照
+        
+        Returns:
+            TemplateSnapshot: 替换后的当前快照
+        """
+        with self._reload_lock:
+            current = self._snapshot
+            reader = None
+            try:
+                stat = os.stat(self.template_file_path)
+                if self.template_file_path.endswith(SNAPSHOT_SUFFIX):
+                    # 直接部署的二进制快照，以头部记录的源JSON摘要判断内容是否变化
+                    reader = SnapshotReader(self.template_file_path)
+                    digest = reader.source_digest
+                else:
+                    with open(self.template_file_path, 'rb') as f:
+                        raw = f.read()
+                    digest = hashlib.sha256(raw).hexdigest()
+                
+                if digest == current.digest:
+                    # 文件被touch但内容未变，沿用已编译的解析器
+                    parser = current.parser
+                else:
+                    templates = reader.load() if reader is not None else json.loads(raw.decode('utf-8'))
+                    parser = TemplateParser(self.template_file_path, templates=templates)
+            except Exception as e:
+                # 新文件有误时保留旧快照，避免线上服务丢失全部模板
+                print(f"加载模板文件失败: {e}")
+                return current
+            finally:
+                if reader is not None:
+                    reader.close()
+            
+            # 单次引用赋值即完成替换，读路径无需加锁
+            self._snapshot = TemplateSnapshot(parser, stat.st_mtime_ns, stat.st_size, digest)
+            if self.cache is not None and parser is not current.parser:
+                # 缓存键带有快照摘要，旧快照的结果不会再命中，这里只是尽早释放
+                self.cache.clear()
+            return self._snapshot
+    
+    def _is_stale(self, snapshot):
+        """
+        判断模板文件自快照生成后是否发生变化
+        
+        Args:
+            snapshot: 当前快照
+            
+        Returns:
+            bool: 是否需要重新加载
+        """
+        try:
+            stat = os.stat(self.template_file_path)
+        except OSError:
+            return False
+        return (stat.st_mtime_ns, stat.st_size) != (snapshot.mtime_ns, snapshot.size)
+    
+    def get_snapshot(self):
+        """
+        获取当前模板快照，按检查间隔探测文件变化并热加载
+        
+        Returns:
+            TemplateSnapshot: 当前快照
+        """
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if now < self._next_check:
+            return snapshot
+        self._next_check = now + self.check_interval
+        return self.refresh()
+    
+    def current_snapshot(self):
+        """
+        获取当前模板快照，不检查文件变化，不做任何I/O
+        
+        Returns:
+            TemplateSnapshot: 当前快照
+        """
+        return self._snapshot
+    
+    def refresh(self):
+        """
+        立即检查模板文件，有变化时重新加载；供后台定时任务调用，使请求路径无需访问文件
+        
+        Returns:
+            TemplateSnapshot: 当前快照
+        """
+        snapshot = self._snapshot
+        if self._is_stale(snapshot):
+            snapshot = self.reload()
+        return snapshot
+    
+    def get_parser(self):
+        """
+        获取当前快照的模板解析器
+        
+        Returns:
+            TemplateParser: 模板解析器
+        """
+        return self.get_snapshot().parser
+    
+    def resolve(self, user_data, snapshot=None):
+        """
+        查找最佳匹配的模板，启用缓存时优先读取缓存结果
+        
+        Args:
+            user_data: 用户数据
+            snapshot: 指定使用的模板快照，默认为当前快照
+            
+        Returns:
+            dict: 最佳匹配的模板和填充后的内容
+        """
+        if not metrics.enabled:
+            return self._resolve(user_data, snapshot)
         
+        if snapshot is None:
+            # 调用方已指定快照时没有加载开销，不记录load阶段
+            start = time.perf_counter()
+            snapshot = self.get_snapshot()
+            metrics.STAGE_SECONDS.observe(time.perf_counter() - start, "load")
+        
+        result = self._resolve(user_data, snapshot)
+        if result["template"] is not None:
+            metrics.MATCHES.inc(result["template"].get("name", ""))
+        else:
+            metrics.NO_MATCHES.inc()
+        return result
+    
+    def _resolve(self, user_data, snapshot):
+        if snapshot is None:
+            snapshot = self.get_snapshot()
+        parser = snapshot.parser
+        if self.cache is None:
+            return parser.find_best_template(user_data)
+        
+        key = parser.cache_key(user_data)
+        if key is None:
+            return parser.find_best_template(user_data)
+        key = (snapshot.digest, key)
+        
+        if metrics.enabled:
+            start = time.perf_counter()
+            result = self.cache.get(key)
+            metrics.STAGE_SECONDS.observe(time.perf_counter() - start, "cache")
+        else:
+            result = self.cache.get(key)
+        if result is None:
+            result = parser.find_best_template(user_data)
+            self.cache.put(key, result)
+        # 返回浅拷贝，调用方修改结果不会影响缓存
+        return dict(result)
+    
+    def cache_stats(self):
+        """
+        获取解析结果缓存的统计信息
+        
+        Returns:
+            dict: 缓存统计，未启用缓存时返回None
+        """
+        return self.cache.stats() if self.cache is not None else None
+
+
+class TemplateSetManager:
+    def __init__(self, directory, max_sets=16, max_templates=0, idle_ttl=None, cache_size=0, cache_ttl=None):
+        """
+        管理目录下的多个命名模板集，每个模板集（<目录>/<名称>.json）有独立的注册表和匹配索引，
+        首次使用时加载，超出数量或模板总数上限时淘汰最久未使用的模板集
+        
+        Args:
+            directory: 模板集目录
+            max_sets: 最多同时加载的模板集数
+            max_templates: 已加载模板集的模板总数上限，为0时不限制
+            idle_ttl: 模板集空闲多久（秒）后淘汰，为None时不按空闲时间淘汰
+            cache_size: 每个模板集的解析结果缓存条数
+            cache_ttl: 解析结果缓存的有效期（秒）
+        """
+        self.directory = directory
+        self.max_sets = max_sets
+        self.max_templates = max_templates
+        self.idle_ttl = idle_ttl
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.loads = 0
+        self.evictions = 0
+        # 名称 -> [注册表, 最近使用时间]；请求路径只更新使用时间，淘汰时按使用时间排序
+        self._sets = {}
+        self._lock = threading.Lock()
+    
+    def template_file_path(self, name):
+        """
+        获取模板集对应的模板文件路径
+        
+        Args:
+            name: 模板集名称
+            
+        Returns:
+            str: 模板文件路径，名称不合法时返回None
+        """
+        if not isinstance(name, str) or not NAMESPACE_PATTERN.match(name):
+            return None
+        return os.path.join(self.directory, name + ".json")
+    
+    def available(self):
+        """
+        列出目录下的全部模板集名称
+        
+        Returns:
+            list: 模板集名称
+        """
+        try:
+            file_names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return sorted(os.path.splitext(file_name)[0] for file_name in file_names
+                      if file_name.endswith(".json") and NAMESPACE_PATTERN.match(os.path.splitext(file_name)[0]))
+    
+    def loaded(self, name):
+        """
+        获取已加载的模板集注册表并更新使用时间，不加锁也不做任何I/O，可在事件循环中调用
+        
+        Args:
+            name: 模板集名称
+            
+        Returns:
+            TemplateRegistry: 注册表，未加载时返回None
+        """
+        entry = self._sets.get(name)
+        if entry is None:
+            return None
+        entry[1] = time.monotonic()
+        return entry[0]
+    
+    def get(self, name):
+        """
+        获取模板集注册表，未加载时加载并编译
+        
+        Args:
+            name: 模板集名称
+            
+        Returns:
+            TemplateRegistry: 注册表
+            
+        Raises:
+            KeyError: 模板集不存在
+        """
+        with self._lock:
+            entry = self._sets.get(name)
+            if entry is not None:
+                entry[1] = time.monotonic()
+                return entry[0]
+            
+            template_file_path = self.template_file_path(name)
+            if template_file_path is None or not os.path.isfile(template_file_path):
+                raise KeyError(name)
+            registry = TemplateRegistry(template_file_path, cache_size=self.cache_size, cache_ttl=self.cache_ttl)
+            self._sets[name] = [registry, time.monotonic()]
+            self.loads += 1
+            self._evict(keep=name)
+            return registry
+    
+    @staticmethod
+    def _template_count(registry):
+        return len(registry.current_snapshot().parser.templates)
+    
+    def _evict(self, keep=None):
+        """
+        淘汰空闲超时的模板集，再从最久未使用的开始淘汰超出上限的模板集；调用方需持有锁
+        
+        Args:
+            keep: 不淘汰的模板集名称（刚加载的模板集）
+        """
+        if self.idle_ttl is not None:
+            deadline = time.monotonic() - self.idle_ttl
+            for name in [name for name, (_, used_at) in self._sets.items() if used_at < deadline and name != keep]:
+                del self._sets[name]
+                self.evictions += 1
+        
+        total = sum(self._template_count(registry) for registry, _ in self._sets.values())
+        for name in sorted(self._sets, key=lambda name: self._sets[name][1]):
+            over_sets = len(self._sets) > self.max_sets
+            over_templates = self.max_templates and total > self.max_templates
+            if not over_sets and not over_templates:
+                break
+            if name == keep:
+                continue
+            registry, _ = self._sets.pop(name)
+            total -= self._template_count(registry)
+            self.evictions += 1
+    
+    def loaded_count(self):
+        return len(self._sets)
+    
+    def refresh(self):
+        """
+        检查已加载模板集的文件变化并淘汰空闲模板集，供后台定时任务调用
+        """
+        with self._lock:
+            self._evict()
+            registries = [registry for registry, _ in self._sets.values()]
+        for registry in registries:
+            registry.refresh()
+    
+    def stats(self):
+        """
+        获取模板集的加载情况
+        
+        Returns:
+            dict: 可用及已加载的模板集、加载和淘汰次数
+        """
+        with self._lock:
+            loaded = {name: {"templates": self._template_count(registry),
+                             "digest": registry.current_snapshot().digest,
+                             "idle_seconds": time.monotonic() - used_at}
+                      for name, (registry, used_at) in self._sets.items()}
         return {
-            "template": best_template,
-            "content": content
+            "directory": self.directory,
+            "available": self.available(),
+            "loaded": loaded,
+            "max_sets": self.max_sets,
+            "max_templates": self.max_templates,
+            "loads": self.loads,
+            "evictions": self.evictions
         }
 
+
+_registries = {}
+_registries_lock = threading.Lock()
+_template_sets = None
+
+def _default_template_path():
+    # 可通过环境变量TEMPLATE_FILE_PATH指定模板文件
+    if os.environ.get("TEMPLATE_FILE_PATH"):
+        return os.environ["TEMPLATE_FILE_PATH"]
+    # 获取当前脚本所在目录
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, "template.json")
+
+def get_registry(template_file_path=None):
+    """
+    获取模板文件对应的进程级注册表，首次调用时加载模板
+    
+    Args:
+        template_file_path: 模板文件路径，默认为当前目录下的template.json
+        
+    Returns:
+        TemplateRegistry: 模板注册表
+    """
+    if template_file_path is None:
+        template_file_path = _default_template_path()
+    key = os.path.abspath(template_file_path)
+    registry = _registries.get(key)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.get(key)
+            if registry is None:
+                registry = TemplateRegistry(key, cache_size=DEFAULT_CACHE_SIZE, cache_ttl=DEFAULT_CACHE_TTL)
+                _registries[key] = registry
+    return registry
+
+def get_template_sets():
+    """
+    获取进程级的模板集管理器，模板集目录可通过环境变量TEMPLATE_SETS_DIR指定，默认为当前目录下的template_sets
+    
+    Returns:
+        TemplateSetManager: 模板集管理器
+    """
+    global _template_sets
+    if _template_sets is None:
+        with _registries_lock:
+            if _template_sets is None:
+                directory = os.environ.get("TEMPLATE_SETS_DIR") or os.path.join(
+                    os.path.dirname(os.path.abspath(__file__)), "template_sets")
+                _template_sets = TemplateSetManager(directory, DEFAULT_SETS_MAX, DEFAULT_SETS_MAX_TEMPLATES,
+                                                    DEFAULT_SETS_IDLE_TTL, DEFAULT_CACHE_SIZE, DEFAULT_CACHE_TTL)
+    return _template_sets
+
 # 使用示例
-def parse_template(user_data, template_file_path=None):
+def parse_template(user_data, template_file_path=None, namespace=None):
     """
     解析模板
     
     Args:
         user_data: 用户数据
         template_file_path: 模板文件路径，默认为当前目录下的template.json
+        namespace: 模板集名称，指定时使用模板集目录下的同名模板集，忽略template_file_path
         
     Returns:
         dict: 最佳匹配的模板和填充后的内容
     """
-    if template_file_path is None:
-        # 获取当前脚本所在目录
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        template_file_path = os.path.join(current_dir, "template.json")
-    
-    parser = TemplateParser(template_file_path)
-    return parser.find_best_template(user_data)
\ No newline at end of file
+    if namespace:
+        return get_template_sets().get(namespace).resolve(user_data)
+    return get_registry(template_file_path).resolve(user_data)
\ No newline at end of file
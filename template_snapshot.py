@@ -0,0 +1,309 @@
+import json
+import os
+import sys
+import mmap
+import struct
+import hashlib
+from array import array
+
+# 二进制快照格式：
+#   头部 | 字符串区（UTF-8） | 字符串偏移表 u32[字符串数+1] | 顶层元素偏移表 u32[] | 值单元 u32[]
+# 值按单元编码，字符串只存字符串表中的序号：
+#   null/false/true: [tag]
+#   str/int/float:   [tag, 字符串序号]（数值以repr存入字符串表）
+#   list:            [tag, 元素个数, 元素所占单元数, 元素...]
+#   dict:            [tag, 键个数, 键值所占单元数, (键的字符串序号, 值)...]
+# list/dict记录了所占单元数，读取单个字段时可直接跳过其他字段而不解码。
+# 所有整数均为小端序，偏移表和值单元区4字节对齐，可直接在mmap上按u32读取；
+# 字符串和元素只在访问时解码，未访问的部分留在多个worker进程共享的页缓存中。
+# 头部记录源JSON的sha256以及生成快照时的文件大小和修改时间，判断快照是否过期只需stat源文件。
+SNAPSHOT_MAGIC = b"TPLSNAP\0"
+SNAPSHOT_VERSION = 2
+SNAPSHOT_SUFFIX = ".snapshot"
+HEADER = struct.Struct("<8sHH32sQqIIII")
+
+TAG_NULL = 0
+TAG_FALSE = 1
+TAG_TRUE = 2
+TAG_INT = 3
+TAG_FLOAT = 4
+TAG_STR = 5
+TAG_LIST = 6
+TAG_DICT = 7
+
+
+def snapshot_path_for(json_file_path):
+    """
+    获取JSON文件对应的快照文件路径，如 template.json -> template.snapshot
+    """
+    return os.path.splitext(json_file_path)[0] + SNAPSHOT_SUFFIX
+
+
+class _Encoder:
+    def __init__(self):
+        self.strings = []
+        self.string_ids = {}
+        self.cells = array('I')
+
+    def _string_id(self, value):
+        string_id = self.string_ids.get(value)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.strings.append(value)
+            self.string_ids[value] = string_id
+        return string_id
+
+    def encode(self, value):
+        cells = self.cells
+        if value is None:
+            cells.append(TAG_NULL)
+        elif value is True:
+            cells.append(TAG_TRUE)
+        elif value is False:
+            cells.append(TAG_FALSE)
+        elif isinstance(value, str):
+            cells.extend((TAG_STR, self._string_id(value)))
+        elif isinstance(value, int):
+            cells.extend((TAG_INT, self._string_id(repr(value))))
+        elif isinstance(value, float):
+            cells.extend((TAG_FLOAT, self._string_id(repr(value))))
+        elif isinstance(value, list):
+            start = len(cells)
+            cells.extend((TAG_LIST, len(value), 0))
+            for item in value:
+                self.encode(item)
+            cells[start + 2] = len(cells) - start - 3
+        elif isinstance(value, dict):
+            start = len(cells)
+            cells.extend((TAG_DICT, len(value), 0))
+            for key, item in value.items():
+                cells.append(self._string_id(key))
+                self.encode(item)
+            cells[start + 2] = len(cells) - start - 3
+        else:
+            raise TypeError(f"快照不支持的数据类型: {type(value).__name__}")
+
+
+def compile_snapshot(json_file_path, snapshot_file_path=None):
+    """
+    将JSON文件编译为二进制快照，JSON仍是编辑用的源文件
+
+    Args:
+        json_file_path: JSON文件路径，顶层必须是列表
+        snapshot_file_path: 快照文件路径，默认为JSON文件同目录下的同名.snapshot文件
+
+    Returns:
+        str: 快照文件路径
+    """
+    if snapshot_file_path is None:
+        snapshot_file_path = snapshot_path_for(json_file_path)
+
+    with open(json_file_path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        raw = f.read()
+    data = json.loads(raw.decode('utf-8'))
+    if not isinstance(data, list):
+        raise ValueError("快照只支持顶层为列表的JSON文件")
+
+    encoder = _Encoder()
+    offsets = array('I')
+    for item in data:
+        offsets.append(len(encoder.cells))
+        encoder.encode(item)
+
+    encoded = [s.encode('utf-8') for s in encoder.strings]
+    string_offsets = array('I', [0])
+    for s in encoded:
+        string_offsets.append(string_offsets[-1] + len(s))
+    strings = b"".join(encoded)
+    padding = b"\0" * (-(HEADER.size + len(strings)) % 4)
+    words = string_offsets + offsets + encoder.cells
+    if sys.byteorder != "little":
+        words.byteswap()
+
+    header = HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, hashlib.sha256(raw).digest(), stat.st_size,
+                         stat.st_mtime_ns, len(encoder.strings), len(strings), len(offsets), len(encoder.cells))
+    # 先写临时文件再替换，已映射旧快照的进程不受影响
+    tmp_file_path = snapshot_file_path + ".tmp"
+    with open(tmp_file_path, 'wb') as f:
+        f.write(header)
+        f.write(strings)
+        f.write(padding)
+        f.write(words.tobytes())
+    os.replace(tmp_file_path, snapshot_file_path)
+    return snapshot_file_path
+
+
+class SnapshotReader:
+    def __init__(self, snapshot_file_path):
+        """
+        以mmap方式打开二进制快照，字符串和顶层元素都在访问时才解码
+
+        Args:
+            snapshot_file_path: 快照文件路径
+        """
+        self.snapshot_file_path = snapshot_file_path
+        with open(snapshot_file_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            (magic, version, _, source_digest, source_size, source_mtime_ns, string_count, strings_size,
+             element_count, cell_count) = HEADER.unpack_from(self._mmap, 0)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError(f"不支持的快照文件: {snapshot_file_path}")
+            self.source_digest = source_digest.hex()
+            self.source_fingerprint = (source_size, source_mtime_ns)
+
+            self._strings_offset = HEADER.size
+            offset = HEADER.size + strings_size + (-(HEADER.size + strings_size) % 4)
+            words = memoryview(self._mmap)[offset:offset + 4 * (string_count + 1 + element_count + cell_count)]
+            if sys.byteorder == "little":
+                words = words.cast('I')
+            else:
+                words = array('I', words.tobytes())
+                words.byteswap()
+            self._string_offsets = words[:string_count + 1]
+            self._offsets = words[string_count + 1:string_count + 1 + element_count]
+            self._cells = words[string_count + 1 + element_count:]
+            # 已解码的字符串，驻留后所有解码结果共享相同的键和值对象
+            self._strings = [None] * string_count
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        # 解码得到的对象不引用mmap，释放视图后即可关闭
+        self._string_offsets = self._offsets = self._cells = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        return self._decode(self._offsets[index])[0]
+
+    def __iter__(self):
+        for offset in self._offsets:
+            yield self._decode(offset)[0]
+
+    def load(self):
+        """
+        解码全部顶层元素
+
+        Returns:
+            list: 与源JSON相同的数据
+        """
+        return list(self)
+
+    def field(self, index, key):
+        """
+        只解码顶层元素中的一个字段，其余字段直接跳过
+
+        Args:
+            index: 顶层元素序号
+            key: 字段名
+
+        Returns:
+            字段值，元素不是dict或没有该字段时返回None
+        """
+        cells = self._cells
+        pos = self._offsets[index]
+        if cells[pos] != TAG_DICT:
+            return None
+        count = cells[pos + 1]
+        pos += 3
+        for _ in range(count):
+            if self._string(cells[pos]) == key:
+                return self._decode(pos + 1)[0]
+            pos = self._skip(pos + 1)
+        return None
+
+    def _string(self, string_id):
+        value = self._strings[string_id]
+        if value is None:
+            start = self._strings_offset + self._string_offsets[string_id]
+            end = self._strings_offset + self._string_offsets[string_id + 1]
+            value = sys.intern(self._mmap[start:end].decode('utf-8'))
+            self._strings[string_id] = value
+        return value
+
+    def _skip(self, pos):
+        tag = self._cells[pos]
+        if tag == TAG_LIST or tag == TAG_DICT:
+            return pos + 3 + self._cells[pos + 2]
+        if tag == TAG_NULL or tag == TAG_TRUE or tag == TAG_FALSE:
+            return pos + 1
+        return pos + 2
+
+    def _decode(self, pos):
+        cells = self._cells
+        tag = cells[pos]
+        if tag == TAG_STR:
+            return self._string(cells[pos + 1]), pos + 2
+        if tag == TAG_DICT:
+            count = cells[pos + 1]
+            pos += 3
+            result = {}
+            for _ in range(count):
+                key = self._string(cells[pos])
+                result[key], pos = self._decode(pos + 1)
+            return result, pos
+        if tag == TAG_LIST:
+            count = cells[pos + 1]
+            pos += 3
+            result = []
+            for _ in range(count):
+                item, pos = self._decode(pos)
+                result.append(item)
+            return result, pos
+        if tag == TAG_NULL:
+            return None, pos + 1
+        if tag == TAG_TRUE:
+            return True, pos + 1
+        if tag == TAG_FALSE:
+            return False, pos + 1
+        if tag == TAG_INT:
+            return int(self._string(cells[pos + 1])), pos + 2
+        if tag == TAG_FLOAT:
+            return float(self._string(cells[pos + 1])), pos + 2
+        raise ValueError(f"快照数据损坏，未知类型标记: {tag}")
+
+
+def open_fresh_snapshot(json_file_path):
+    """
+    打开与JSON源文件一致的快照，只比较源文件的大小和修改时间，不读取源文件内容
+
+    Args:
+        json_file_path: JSON文件路径
+
+    Returns:
+        SnapshotReader: 快照读取器，快照不存在、格式不支持或已过期时返回None
+    """
+    snapshot_file_path = snapshot_path_for(json_file_path)
+    if not os.path.exists(snapshot_file_path):
+        return None
+    try:
+        stat = os.stat(json_file_path)
+        reader = SnapshotReader(snapshot_file_path)
+    except (OSError, ValueError) as e:
+        print(f"加载快照文件失败: {e}")
+        return None
+    if reader.source_fingerprint != (stat.st_size, stat.st_mtime_ns):
+        reader.close()
+        return None
+    return reader
+
+
+def main():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    json_file_paths = sys.argv[1:] or [os.path.join(current_dir, "template.json"),
+                                       os.path.join(current_dir, "dependency.json")]
+    for json_file_path in json_file_paths:
+        snapshot_file_path = compile_snapshot(json_file_path)
+        print(f"快照已生成: {snapshot_file_path} ({os.path.getsize(snapshot_file_path)} 字节)")
+
+if __name__ == "__main__":
+    main()